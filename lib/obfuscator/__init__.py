@@ -24,15 +24,38 @@ __license__ = "GPLv2"
 __version__ = "1.1.5"
 
 # Imports ######################################################################
-import sys
+import array
 import random
 import operator
+from collections import OrderedDict
 
-if sys.version_info.major > 2:
-    xrange = range
+from . import instrument
+from .instrument import stats
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
 
 # Globals ######################################################################
 DEFAULT_ENCODER = 1
+CHUNK_SIZE = 64 * 1024  # Number of bytes processed at a time by the stream/buffer functions
+
+# Memoized 256-byte translation tables, keyed by (combinator, key).  There are
+# only 256 useful keys per combinator, so this never grows very large.
+_TABLES = {}
+_SCHEDULES = OrderedDict()  # key: (block size, mask) of the repeating-key XOR (see `_key_schedule`)
+_MAX_SCHEDULES = 64
+
+
+def _get_encoder(encode_method_type):
+    """Convert the method type to the obfuscation function.  The default type
+    (0) is resolved to `DEFAULT_ENCODER`, so the instrumented `obfuscate()`
+    isn't called (see `_resolve_encoder`).
+
+    :param int encode_method_type: The type encoder used (see _get_encoder_type)
+    """
+    return FUNC_MAP[_resolve_encoder(encode_method_type)][0]
 
 
 def _get_decoder(encode_method_type):
@@ -40,7 +63,15 @@ def _get_decoder(encode_method_type):
 
     :param int encode_method_type: The type encoder used (see _get_encoder_type)
     """
-    return FUNC_MAP[encode_method_type][1]
+    return FUNC_MAP[_resolve_encoder(encode_method_type)][1]
+
+
+def _resolve_encoder(encoder):
+    """Return the `FUNC_MAP` id that `encoder` stands for.  The default encoder
+    (0) maps to `obfuscate()`/`deobfuscate()` themselves, which would count the
+    call a second time when instrumentation is enabled.
+    """
+    return DEFAULT_ENCODER if encoder == 0 else encoder
 
 
 def _get_encoder_type(encoder=None):
@@ -51,7 +82,7 @@ def _get_encoder_type(encoder=None):
     return FUNC_MAP[encoder] if (encoder in FUNC_MAP) else FUNC_MAP[obfuscate_xor]
 
 
-def _encode_operation(data, key, combinator=operator.xor, minimum_length=0):
+def _encode_operation(data, key, combinator=operator.xor, minimum_length=0, byte_source=None):
     """This function encodes the iterable `data` with the key, and combinator.
     The formula used is `[combinator(x, key) for x in data]`.
 
@@ -69,12 +100,292 @@ def _encode_operation(data, key, combinator=operator.xor, minimum_length=0):
     :param int minimum_length: The minimum number of bytes to return.  If the
         encoding operation produces fewer bytes that this, random bytes are
         appended to the end of the result so len(bytes) == minimum_length.
+    :param byte_source: A function that returns `count` random bytes, used for
+        the padding (see `random_bytes`)
     """
     bytes = [combinator(x, key) for x in data]
-    bytes += [random.randint(0, 255) for x in xrange(minimum_length - len(bytes))]
+    bytes += bytearray(_random_bytes(minimum_length - len(bytes), byte_source))
     return bytes
 
 
+def random_bytes(count):
+    """Return `count` random bytes from the `random` module.  This is the
+    default byte source used for padding and header noise; the bytes are drawn
+    with a single `random.getrandbits` call.
+
+    Any function with the same signature can be used as a byte source instead,
+    e.g. `os.urandom`, or `seeded_byte_source(seed)` for reproducible output.
+
+    :param int count: The number of bytes to return
+    """
+    if count <= 0:
+        return b""
+    return random.getrandbits(8 * count).to_bytes(count, "little")
+
+
+def seeded_byte_source(seed):
+    """Return a byte source (see `random_bytes`) that produces the same bytes
+    for the same seed; useful for reproducible tests.
+
+    :param seed: The seed for the underlying `random.Random` generator
+    """
+    generator = random.Random(seed)
+
+    def byte_source(count):
+        if count <= 0:
+            return b""
+        return generator.getrandbits(8 * count).to_bytes(count, "little")
+
+    return byte_source
+
+
+def _random_bytes(count, byte_source=None):
+    """Return `count` random bytes from `byte_source` (by default, `random_bytes`),
+    used to pad encoded data.
+
+    :param int count: The number of bytes to return
+    :param byte_source: A function that returns `count` random bytes
+    """
+    if count <= 0:
+        return b""
+    return (byte_source or random_bytes)(count)
+
+
+def _is_buffer(data):
+    """Return True if `data` is a bytes-like object that can be translated
+    directly (instead of being treated as a list of ints).
+    """
+    return isinstance(data, (bytes, bytearray, memoryview))
+
+
+def _get_table(combinator, key):
+    """Return the translation table for `combinator(x, key)`.
+
+    The table is a 256-byte string where the value at index `x` is
+    `combinator(x, key) & 0xFF`.  Tables are memoized, so repeated calls with
+    the same combinator and key cost nothing to set up.
+
+    :param code combinator: The function used to combine each byte and the key
+    :param int key: The key used during encoding/decoding
+    """
+    table = _TABLES.get((combinator, key))
+    if table is None:
+        table = bytes(bytearray(combinator(x, key) & 0xFF for x in range(256)))
+        _TABLES[(combinator, key)] = table
+    return table
+
+
+def _translate(data, table, minimum_length=0, byte_source=None):
+    """Apply `table` to the bytes-like `data` with a single `translate` call.
+
+    A `bytearray` is returned for `bytearray` input; `bytes` is returned for
+    everything else.
+
+    :param bytes data: The data you want to translate
+    :param bytes table: A 256-byte table (see `_get_table`)
+    :param int minimum_length: The minimum number of bytes to return.  If the
+        translation produces fewer bytes that this, random bytes are appended
+        to the end of the result so len(bytes) == minimum_length.
+    :param byte_source: A function that returns `count` random bytes, used for
+        the padding (see `random_bytes`)
+    """
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+
+    result = data.translate(table)
+    if minimum_length > len(result):
+        result += _random_bytes(minimum_length - len(result), byte_source)
+
+    return result
+
+
+def _apply_table(data, table, minimum_length=0, byte_source=None):
+    """Translate `data` with `table`.
+
+    Bytes-like data is translated directly and returned as bytes.  Any other
+    iterable is treated as a list of ints, translated in bulk and returned as a
+    list; a `ValueError` is raised if an item does not fit in a byte.
+
+    :param iterable data: The data you want to translate
+    :param bytes table: A 256-byte table (see `_get_table`)
+    :param int minimum_length: The minimum number of bytes to return.
+    :param byte_source: The source of the padding (see `random_bytes`)
+    """
+    if _is_buffer(data):
+        return _translate(data, table, minimum_length, byte_source)
+
+    return list(_translate(bytearray(data), table, minimum_length, byte_source))
+
+
+def _table_operation(data, key, combinator=operator.xor, minimum_length=0, byte_source=None):
+    """Encode or decode `data` using a translation table built from `combinator`
+    and `key` (see `_apply_table`).
+
+    Lists containing items that do not fit in a byte fall back to
+    `_encode_operation`.
+
+    :param iterable data: The data you want to encode/decode
+    :param int key: The key used during encoding/decoding
+    :param code combinator: The function used to combine each byte and the key
+    :param int minimum_length: The minimum number of bytes to return.
+    :param byte_source: The source of the padding (see `random_bytes`)
+    """
+    table = _get_table(combinator, key)
+    if not _is_buffer(data):
+        data = list(data)
+
+    try:
+        return _apply_table(data, table, minimum_length, byte_source)
+    except (TypeError, ValueError):
+        return _encode_operation(data, key, combinator, minimum_length, byte_source)
+
+
+def _byte_view(buf, writable=False):
+    """Return a flat, unsigned-byte memoryview of the buffer `buf`.
+
+    :param buf: Any object supporting the buffer protocol
+    :param bool writable: Raise a TypeError if the buffer is read-only
+    """
+    view = memoryview(buf)
+    if view.format != "B" or view.ndim != 1:
+        view = view.cast("B")
+    if writable and view.readonly:
+        raise TypeError("Cannot modify a read-only buffer")
+    return view
+
+
+def _translate_into(source, target, table, minimum_length=0, byte_source=None):
+    """Translate the bytes-like `source` with `table`, writing the result into
+    the writable memoryview `target`.  `source` and `target` may be the same
+    buffer.  The data is translated `CHUNK_SIZE` bytes at a time, so only a
+    small temporary copy is ever needed.
+
+    :param source: The data you want to translate
+    :param memoryview target: Where the translated data is written
+    :param bytes table: A 256-byte table (see `_get_table`)
+    :param int minimum_length: The minimum number of bytes to write.  If the
+        source is shorter than this, random bytes are written after it.
+    :param byte_source: The source of the padding (see `random_bytes`)
+    :returns: The number of bytes written
+    """
+    source = _byte_view(source)
+    length = len(source)
+    total = max(length, minimum_length)
+    if len(target) < total:
+        raise ValueError("Output buffer is too small: %i < %i" % (len(target), total))
+
+    for start in range(0, length, CHUNK_SIZE):
+        end = min(start + CHUNK_SIZE, length)
+        target[start:end] = source[start:end].tobytes().translate(table)
+
+    target[length:total] = _random_bytes(total - length, byte_source)
+    return total
+
+
+def _transform_into(source, target, encoder, key, decode=False, minimum_length=0, byte_source=None):
+    """Encode (or decode) the bytes-like `source` with `encoder`, writing the
+    result into the writable memoryview `target`.  `source` and `target` may be
+    the same buffer.
+
+    :param source: The data you want to encode/decode
+    :param memoryview target: Where the result is written
+    :param int encoder: The `FUNC_MAP` id of the encoder; it must produce bytes
+    :param key: The key used during encoding
+    :param bool decode: Decode instead of encode
+    :param int minimum_length: The minimum number of bytes to write.
+    :param byte_source: The source of the padding (see `random_bytes`)
+    :returns: The number of bytes written
+    """
+    if encoder == FUNC_MAP[obfuscate_xor_multi]:
+        return _xor_repeating(source, _multi_key(key), minimum_length, target, byte_source)
+    return _translate_into(source, target, _get_byte_table(encoder, key, decode), minimum_length, byte_source)
+
+
+def _get_byte_table(encoder, key, decode=False):
+    """Return the translation table that implements `encoder` with `key`.
+
+    Only encoders whose output always fits in a byte can be expressed as a
+    table; a ValueError is raised for the others.
+
+    :param int encoder: The `FUNC_MAP` id of the encoder
+    :param int key: The key used during encoding
+    :param bool decode: Return the table for decoding instead of encoding
+    """
+    encoder = _resolve_encoder(encoder)
+    if encoder == 1:
+        return _get_table(operator.xor, key)
+    elif encoder == 3:
+        return _ROT13_TABLE
+    elif encoder == 5:
+        return _get_table(operator.sub if decode else operator.add, key)
+
+    raise ValueError("Encoder %r cannot be expressed as a translation table" % encoder)
+
+
+def _use_numpy(data, backend=None):
+    """Return True if `data` should be processed with the NumPy backend.
+
+    :param data: The data you want to encode/decode
+    :param str backend: `"numpy"`, `"python"`, or None to use NumPy only when
+        `data` is already an `ndarray`
+    """
+    if backend is None:
+        return (numpy is not None) and isinstance(data, numpy.ndarray)
+    elif backend == "numpy":
+        if numpy is None:
+            raise ImportError("The numpy backend requires NumPy to be installed")
+        return True
+    elif backend == "python":
+        return False
+
+    raise ValueError("Unknown backend: %r" % backend)
+
+
+def _numpy_operation(data, key, ufunc, minimum_length=0, dtype=None, byte_source=None):
+    """This function encodes/decodes `data` with a vectorized NumPy operation.
+    The formula used is `ufunc(data, key)`.
+
+    `ndarray` input is used as-is (bytes-like input is viewed as `uint8`), and
+    an `ndarray` is returned.
+
+    :param data: The data you want to encode/decode
+    :param int key: The key used during encoding/decoding
+    :param ufunc: The NumPy function used to combine the data and the key
+    :param int minimum_length: The minimum number of items to return.  If the
+        operation produces fewer items that this, random bytes are appended.
+    :param dtype: The minimum dtype of the result (e.g. `uint16` when the
+        result can exceed 0xFF)
+    :param byte_source: The source of the padding (see `random_bytes`)
+    """
+    if isinstance(data, numpy.ndarray):
+        array = data
+    elif _is_buffer(data):
+        array = numpy.frombuffer(data, dtype=numpy.uint8)
+    else:
+        array = numpy.asarray(list(data))
+        if array.size and 0 <= array.min() and array.max() <= 0xFF:
+            array = array.astype(numpy.uint8)
+
+    if dtype is not None:
+        array = array.astype(numpy.promote_types(array.dtype, dtype), copy=False)
+
+    result = ufunc(array, key)
+    if minimum_length > result.size:
+        padding = numpy.frombuffer(_random_bytes(minimum_length - result.size, byte_source), dtype=numpy.uint8)
+        result = numpy.concatenate((result.ravel(), padding.astype(result.dtype)))
+
+    return result
+
+
+def _has_table(encoder):
+    """Return True if `encoder` can be expressed as a translation table."""
+    try:
+        _get_byte_table(encoder, 0)
+    except ValueError:
+        return False
+    return True
+
+
 def _decode_operation(data, key, combinator=operator.xor):
     """This function decodes the iterable `data` with the key and combinator.
     The formula used is `[combinator(x, key) for x in data]`.
@@ -102,75 +413,624 @@ def _decode_operation(data, key, combinator=operator.xor):
     return bytes
 
 
-def obfuscate(data, key=None, minimum_length=32, encoder=DEFAULT_ENCODER):
+def obfuscate(data, key=None, minimum_length=32, encoder=DEFAULT_ENCODER, out=None, workers=None,
+              byte_source=None):
     """This function obfuscates the data using the default operation.
+
+    `byte_source` is the function used to create the padding (see
+    `random_bytes`).
+
+    If `out` is given, the encoded data (and any padding) is written into that
+    writable buffer instead of a new object, and `(key, out)` is returned.
+
+    If `workers` is given, bytes-like data larger than `parallel.THRESHOLD`
+    (`parallel.TABLE_THRESHOLD` for the table encoders) is split across that
+    many processes (see `obfuscator.parallel`).
     """
-    return FUNC_MAP[encoder][0](data, key, minimum_length)
+    encoder = _resolve_encoder(encoder)
+    if instrument.ENABLED:
+        timer = instrument.Timer()
+        result = _obfuscate(data, key, minimum_length, encoder, out, workers, byte_source)
+        length = _length(data)
+        instrument.record("obfuscate", encoder, length, len(result[1]), timer, max(0, len(result[1]) - length))
+        return result
+
+    return _obfuscate(data, key, minimum_length, encoder, out, workers, byte_source)
 
 
-def deobfuscate(key, data, encoder=DEFAULT_ENCODER):
+def _obfuscate(data, key, minimum_length, encoder, out, workers, byte_source):
+    if _use_workers(data, encoder, workers):
+        from .parallel import transform
+        key, _ = FUNC_MAP[encoder][0](b"", key, 0)
+        result = transform(data, key, encoder, workers)
+        if minimum_length > len(result):
+            result += _random_bytes(minimum_length - len(result), byte_source)
+        return (key, _parallel_result(data, result, out))
+
+    if out is None:
+        return FUNC_MAP[encoder][0](data, key, minimum_length, byte_source=byte_source)
+
+    key, _ = FUNC_MAP[encoder][0](b"", key, 0)
+    data = data if _is_buffer(data) else bytearray(data)
+    _transform_into(
+        data, _byte_view(out, writable=True), encoder, key, minimum_length=minimum_length, byte_source=byte_source)
+    return (key, out)
+
+
+def deobfuscate(key, data, encoder=DEFAULT_ENCODER, out=None, workers=None):
     """This function obfuscates the data using the default operation.
+
+    If `out` is given, the decoded data is written into that writable buffer
+    instead of a new object, and `out` is returned.
+
+    If `workers` is given, bytes-like data larger than `parallel.THRESHOLD`
+    (`parallel.TABLE_THRESHOLD` for the table encoders) is split across that
+    many processes (see `obfuscator.parallel`).
     """
-    return FUNC_MAP[encoder][1](key, data)
+    encoder = _resolve_encoder(encoder)
+    if instrument.ENABLED:
+        timer = instrument.Timer()
+        result = _deobfuscate(key, data, encoder, out, workers)
+        instrument.record("deobfuscate", encoder, _length(data), len(result), timer)
+        return result
+
+    return _deobfuscate(key, data, encoder, out, workers)
+
+
+def _deobfuscate(key, data, encoder, out, workers):
+    if _use_workers(data, encoder, workers):
+        from .parallel import transform
+        return _parallel_result(data, transform(data, key, encoder, workers, decode=True), out)
+
+    if out is None:
+        return FUNC_MAP[encoder][1](key, data)
+
+    data = data if _is_buffer(data) else bytearray(data)
+    _transform_into(data, _byte_view(out, writable=True), encoder, key, decode=True)
+    return out
+
+
+def _length(data):
+    """Return the length of `data`, or 0 if it doesn't have one."""
+    return len(data) if hasattr(data, "__len__") else 0
+
+
+def obfuscate_text(text, key=None, minimum_length=0, encoder=DEFAULT_ENCODER, encoding="utf-8", byte_source=None):
+    """This function obfuscates the `str` text.  The text is encoded to bytes
+    in a single call, instead of going through `map(ord, text)`.
+
+    Example::
+
+        >>> key, data = obfuscate_text(u"my string")
+        >>> deobfuscate_text(key, data)
+        'my string'
+
+    :param str text: The text you want to obfuscate
+    :param key: The key used during encoding (see `obfuscate`)
+    :param int minimum_length: The minimum number of bytes to return.  Unlike
+        `obfuscate`, the text isn't padded by default, since the padding has to
+        be removed (see `deobfuscate_text`) before the text can be decoded.
+    :param int encoder: The `FUNC_MAP` id of the encoder
+    :param str encoding: The encoding used to convert the text to bytes
+    :param byte_source: The source of the padding (see `random_bytes`)
+    """
+    return obfuscate(text.encode(encoding), key, minimum_length, encoder, byte_source=byte_source)
+
+
+def deobfuscate_text(key, data, encoder=DEFAULT_ENCODER, encoding="utf-8", length=None):
+    """This function deobfuscates the data returned by `obfuscate_text`, and
+    returns it as `str`.
+
+    :param key: The key used during encoding
+    :param data: The obfuscated data
+    :param int encoder: The `FUNC_MAP` id of the encoder
+    :param str encoding: The encoding used to convert the text to bytes
+    :param int length: The number of bytes of encoded text in `data`; needed
+        when the data was padded.
+    """
+    data = deobfuscate(key, data if length is None else data[:length], encoder)
+    return (data if _is_buffer(data) else bytes(bytearray(data))).decode(encoding)
+
+
+def _use_workers(data, encoder, workers):
+    """Return True if `data` should be encoded with a process pool."""
+    if not workers or workers < 2 or not _is_buffer(data):
+        return False
+
+    from .parallel import THRESHOLD, TABLE_THRESHOLD
+    if encoder == FUNC_MAP[obfuscate_xor_multi]:
+        return len(_byte_view(data)) >= THRESHOLD
+    return _has_table(encoder) and len(_byte_view(data)) >= TABLE_THRESHOLD
+
+
+def _parallel_result(data, result, out=None):
+    """Return the `bytes` produced by `parallel.transform` in the same form as
+    the single-process functions would have (see `obfuscate`)."""
+    if out is not None:
+        view = _byte_view(out, writable=True)
+        if len(view) < len(result):
+            raise ValueError("Output buffer is too small: %i < %i" % (len(view), len(result)))
+        view[:len(result)] = result
+        return out
+
+    return bytearray(result) if isinstance(data, bytearray) else result
+
+
+def obfuscate_into(buf, key=None, encoder=DEFAULT_ENCODER):
+    """This function obfuscates a writable buffer in place.  `buf` can be
+    anything supporting the buffer protocol: a `bytearray`, a `memoryview`
+    slice, an `array('B')`, an `mmap`, ...
 
+    Example::
 
-def obfuscate_xor(data, key=None, minimum_length=32):
+        >>> buf = bytearray(b"testing")
+        >>> key = obfuscate_into(buf)
+        >>> deobfuscate_into(key, buf)
+        bytearray(b'testing')
+
+    :param buf: The buffer you want to obfuscate
+    :param int key: The key used during encoding.  By default, the encoder picks
+        a random key.
+    :param int encoder: The `FUNC_MAP` id of the encoder to use; it must produce
+        bytes (XOR, multi-byte XOR or ROT13)
+    :returns: The key used
+    """
+    key, _ = _get_encoder(encoder)(b"", key, 0)
+    view = _byte_view(buf, writable=True)
+    _transform_into(view, view, encoder, key)
+    return key
+
+
+def deobfuscate_into(key, buf, encoder=DEFAULT_ENCODER):
+    """This function deobfuscates a writable buffer in place (see
+    `obfuscate_into`).
+
+    :param int key: The key used during encoding
+    :param buf: The buffer you want to deobfuscate
+    :param int encoder: The `FUNC_MAP` id of the encoder used
+    :returns: `buf`
+    """
+    view = _byte_view(buf, writable=True)
+    _transform_into(view, view, encoder, key, decode=True)
+    return buf
+
+
+def obfuscate_stream(chunks, key=None, minimum_length=32, encoder=DEFAULT_ENCODER, byte_source=None):
+    """This function lazily obfuscates an iterable of chunks using one of the
+    `FUNC_MAP` encoders.  Every encoder works on each byte independently, so
+    the chunks can be encoded one at a time with constant memory.
+
+    The key is chosen before the first chunk is read, so it is returned along
+    with a generator of encoded chunks.  If the stream is shorter than
+    `minimum_length`, random bytes are yielded as a final chunk.
+
+    Example::
+
+        >>> with open('dump.sql', 'rb') as fh:
+        ...     key, chunks = obfuscate_stream(iter(lambda: fh.read(65536), b''))
+        ...     for chunk in chunks:
+        ...         out.write(chunk)
+
+    :param iterable chunks: An iterable of bytes-like chunks
+    :param int key: The key used during encoding.  By default, the encoder picks
+        a random key.
+    :param int minimum_length: The minimum number of bytes to yield
+    :param int encoder: The `FUNC_MAP` id of the encoder to use
+    :param byte_source: A function that returns `count` random bytes, used for
+        the padding (see `random_bytes`)
+    """
+    key, _ = _get_encoder(encoder)(b"", key, 0)
+    return (key, _obfuscate_stream(chunks, key, minimum_length, encoder, byte_source))
+
+
+def _obfuscate_stream(chunks, key, minimum_length, encoder, byte_source=None):
+    """The generator behind `obfuscate_stream`."""
+    encode = _get_encoder(encoder)
+    length = 0
+    for chunk in chunks:
+        yield encode(chunk, _chunk_key(encoder, key, length), 0)[1]
+        length += len(chunk)
+
+    if minimum_length > length:
+        yield _random_bytes(minimum_length - length, byte_source)
+
+
+def deobfuscate_stream(key, chunks, encoder=DEFAULT_ENCODER):
+    """This function lazily deobfuscates an iterable of chunks produced by
+    `obfuscate_stream` (or any other chunking of obfuscated data).
+
+    Any padding is decoded along with the data; it's up to the caller to know
+    where the real data ends.
+
+    :param int key: The key used during encoding
+    :param iterable chunks: An iterable of obfuscated chunks
+    :param int encoder: The `FUNC_MAP` id of the encoder used
+    """
+    decode = _get_decoder(encoder)
+    position = 0
+    for chunk in chunks:
+        yield decode(_chunk_key(encoder, key, position), chunk)
+        position += len(chunk)
+
+
+def obfuscate_many(records, key=None, minimum_length=32, encoder=DEFAULT_ENCODER, byte_source=None):
+    """This function obfuscates a batch of (small) records in one pass.  The
+    result is the same as calling `obfuscate()` on each record with the same
+    keys, without the per-call overhead.
+
+    For the table encoders (XOR, ROT13 and the modulo-256 offset), the random
+    keys are drawn in one call, and each record is translated with a cached
+    table.  Other encoders fall back to encoding each record.
+
+    Example::
+
+        >>> keys, outputs = obfuscate_many([b"alice", b"bob"], minimum_length=0)
+        >>> deobfuscate_many(keys, outputs)
+        [b'alice', b'bob']
+
+    :param iterable records: The bytes-like records (or lists of ints) you want
+        to obfuscate
+    :param key: The key used for every record, a sequence with one key per
+        record, or None to pick a random key per record.  As for `obfuscate()`,
+        a key of 0 (or an empty key) is replaced with a random one.
+    :param int minimum_length: The minimum number of bytes in each output
+    :param int encoder: The `FUNC_MAP` id of the encoder to use
+    :param byte_source: A function that returns `count` random bytes, used for
+        the padding (see `random_bytes`)
+    :returns: `(keys, outputs)`.  `keys` is an `array('B')` when every key fits
+        in a byte, a list otherwise.
+    """
+    records = list(records)
+    keys = _batch_keys(key, len(records), encoder)
+    keys, outputs = _batch_operation(records, keys, encoder, minimum_length=minimum_length, byte_source=byte_source)
+    try:
+        keys = array.array('B', keys)
+    except (TypeError, OverflowError):
+        pass
+    return (keys, outputs)
+
+
+def deobfuscate_many(keys, records, encoder=DEFAULT_ENCODER):
+    """This function deobfuscates a batch of records produced by
+    `obfuscate_many` (see that function).
+
+    :param keys: The key used for every record, or a sequence with one key per
+        record
+    :param iterable records: The records you want to deobfuscate
+    :param int encoder: The `FUNC_MAP` id of the encoder used
+    :returns: A list with the deobfuscated records
+    """
+    records = list(records)
+    keys = _batch_keys(keys, len(records), encoder, pick=False)
+    return _batch_operation(records, keys, encoder, decode=True)[1]
+
+
+def _batch_keys(key, count, encoder, pick=True):
+    """Return one key per record (see `obfuscate_many`).
+
+    If `pick` is True, a missing key (None, 0 or empty, as for `obfuscate()`)
+    is replaced with a random one; for the encoders whose key isn't a single
+    byte, None is returned so the encoder picks it.
+    """
+    if key is None or isinstance(key, (int, bytes)):
+        keys = [key] * count
+    else:
+        keys = list(key)
+        if len(keys) != count:
+            raise ValueError("Expected %i keys, got %i" % (count, len(keys)))
+
+    missing = [index for (index, value) in enumerate(keys) if not value] if pick else []
+    if missing:
+        encoder = _resolve_encoder(encoder)
+        if encoder in (FUNC_MAP[obfuscate_xor], FUNC_MAP[obfuscate_offset_mod]):
+            values = random.choices(range(1, 256), k=len(missing))
+        else:
+            values = [None] * len(missing)
+        for (index, value) in zip(missing, values):
+            keys[index] = value
+    return keys
+
+
+def _each_operation(records, keys, encoder, decode=False, minimum_length=0, byte_source=None):
+    """Encode (or decode) the records one at a time (see `_batch_operation`)."""
+    if decode:
+        return (keys, [_get_decoder(encoder)(k, r) for (k, r) in zip(keys, records)])
+
+    results = [_get_encoder(encoder)(r, k, minimum_length, byte_source=byte_source) for (k, r) in zip(keys, records)]
+    return ([x[0] for x in results], [x[1] for x in results])
+
+
+def _batch_operation(records, keys, encoder, decode=False, minimum_length=0, byte_source=None):
+    """Encode (or decode) each record with its key.  The outputs are the same
+    as encoding each record in turn, padding included.
+
+    :returns: `(keys, outputs)`; `keys` contains the keys picked by the encoder
+    """
+    if not _has_table(encoder) or (None in keys and encoder != FUNC_MAP[obfuscate_rot13]):
+        return _each_operation(records, keys, encoder, decode, minimum_length, byte_source)
+
+    try:
+        data = [x if isinstance(x, (bytes, bytearray)) else (bytes(x) if _is_buffer(x) else bytearray(x))
+                for x in records]
+    except (TypeError, ValueError):
+        # Items that don't fit in a byte; the encoder handles them
+        return _each_operation(records, keys, encoder, decode, minimum_length, byte_source)
+
+    # One table lookup and one `translate` per record.  The padding is drawn
+    # record by record, in order, so a seeded byte source produces the same
+    # bytes as it would for `obfuscate()`.
+    tables = {}
+    outputs = []
+    for (record, item, key) in zip(records, data, keys):
+        table = tables.get(key)
+        if table is None:
+            table = tables[key] = _get_byte_table(encoder, key, decode)
+        output = item.translate(table)
+        if minimum_length > len(output):
+            output += _random_bytes(minimum_length - len(output), byte_source)
+        outputs.append(output if item is record or _is_buffer(record) else list(output))
+
+    return (keys, outputs)
+
+
+def _chunk_key(encoder, key, position):
+    """Return the key used to encode/decode a piece of data that starts
+    `position` bytes into the full data.
+
+    Only the repeating-key XOR encoder depends on the position; its key is
+    rotated so the piece lines up with the rest of the data.
+
+    :param int encoder: The `FUNC_MAP` id of the encoder
+    :param key: The key used for the full data
+    :param int position: The offset of the piece within the full data
+    """
+    if encoder == FUNC_MAP[obfuscate_xor_multi] and key:
+        key = _multi_key(key)
+        position %= len(key)
+        return key[position:] + key[:position]
+    return key
+
+
+def obfuscate_xor(data, key=None, minimum_length=32, backend=None, byte_source=None):
     """This function obfuscates the data using an byte-wise XOR operation.
 
     The formula used is: [x ^ key for x in data]
 
+    Bytes-like data (`bytes`, `bytearray`, `memoryview`) is translated in a
+    single pass and returned as bytes; lists of ints are returned as lists.
+    NumPy arrays are encoded with `numpy.bitwise_xor` and returned as arrays.
+
     :param iterable data: The data you want to obfuscate
     :param int key: The key used for the XOR operation.  By default, the key
         will be a random integer between 1 and 255.
     :param int minimum_length: The minimum number of bytes to return.  If the
         encoding operation produces fewer bytes that this, random bytes are
         appended to the end of the result so len(bytes) == minimum_length.
+    :param str backend: `"numpy"` or `"python"`.  By default, NumPy is used
+        only when `data` is already an `ndarray`.
+    :param byte_source: A function that returns `count` random bytes, used for
+        the padding (see `random_bytes`)
     """
     key = key if key else random.randint(1, 255)
-    bytes = _encode_operation(data, key, combinator=operator.xor, minimum_length=minimum_length)
+    if _use_numpy(data, backend):
+        return (key, _numpy_operation(data, key, numpy.bitwise_xor, minimum_length, byte_source=byte_source))
+
+    bytes = _table_operation(data, key, operator.xor, minimum_length, byte_source)
     return (key, bytes)
 
 
-def deobfuscate_xor(key, data):
+def deobfuscate_xor(key, data, backend=None):
     """This function deobfuscates the data using an byte-wise XOR operation.
 
     The formula used is: [x ^ key for x in data]
 
+    Bytes-like data is returned as bytes; lists of ints are returned as lists.
+    NumPy arrays are returned as arrays.
+
     :param int key: The key used for the XOR operation.
     :param iterable data: The data you want to obfuscate
+    :param str backend: `"numpy"` or `"python"`.  By default, NumPy is used
+        only when `data` is already an `ndarray`.
     """
-    return _decode_operation(data, key, combinator=operator.xor)
+    if _use_numpy(data, backend):
+        return _numpy_operation(data, key, numpy.bitwise_xor)
+
+    return _table_operation(data, key, combinator=operator.xor)
 
 
-def obfuscate_offset(data, key=None, minimum_length=32):
+def obfuscate_offset(data, key=None, minimum_length=32, backend=None, byte_source=None):
     """This function obfuscates the data using an offset operation.
 
     The formula used is: [x + key for x in data]
 
+    NumPy arrays are encoded with `numpy.add` and returned as arrays; the result
+    is at least `uint16` since `x + key` can exceed 0xFF.
+
     :param iterable data: The data you want to obfuscate
     :param int key: The value used for the offset operation.  By default, the
         value will be a random integer between 40 and 127.
     :param int minimum_length: The minimum number of bytes to return.  If the
         encoding operation produces fewer bytes that this, random bytes are
         appended to the end of the result so len(bytes) == minimum_length.
+    :param str backend: `"numpy"` or `"python"`.  By default, NumPy is used
+        only when `data` is already an `ndarray`.
+    :param byte_source: A function that returns `count` random bytes, used for
+        the padding (see `random_bytes`)
     """
     key = key if key else random.randint(40, 127)
-    bytes = _encode_operation(data, key, combinator=operator.add, minimum_length=minimum_length)
+    if _use_numpy(data, backend):
+        return (key, _numpy_operation(data, key, numpy.add, minimum_length, numpy.uint16, byte_source))
+
+    bytes = _encode_operation(data, key, operator.add, minimum_length, byte_source)
     return (key, bytes)
 
 
-def deobfuscate_offset(key, data):
+def deobfuscate_offset(key, data, backend=None):
     """This function deobfuscates the data using an offset operation.
 
     The formula used is: [x - key for x in data]
 
+    NumPy arrays are decoded with `numpy.subtract` and returned as arrays.
+
     :param int key: The key used for the offset operation.
     :param iterable data: The data you want to obfuscate
+    :param str backend: `"numpy"` or `"python"`.  By default, NumPy is used
+        only when `data` is already an `ndarray`.
     """
+    if _use_numpy(data, backend):
+        return _numpy_operation(data, key, numpy.subtract)
+
     return _decode_operation(data, key, combinator=operator.sub)
 
 
-def obfuscate_rot13(data, key=None, minimum_length=32):
+def obfuscate_offset_mod(data, key=None, minimum_length=32, byte_source=None):
+    """This function obfuscates the data using a modulo-256 offset operation.
+
+    The formula used is: [(x + key) % 256 for x in data]
+
+    Unlike `obfuscate_offset`, the result always fits in a byte, so it's
+    translated in a single pass like `obfuscate_xor`.  Bytes-like data is
+    returned as bytes; lists of ints are returned as lists.
+
+    :param iterable data: The data you want to obfuscate
+    :param int key: The value used for the offset operation.  By default, the
+        value will be a random integer between 1 and 255.
+    :param int minimum_length: The minimum number of bytes to return.  If the
+        encoding operation produces fewer bytes that this, random bytes are
+        appended to the end of the result so len(bytes) == minimum_length.
+    :param byte_source: A function that returns `count` random bytes, used for
+        the padding (see `random_bytes`)
+    """
+    key = key if key else random.randint(1, 255)
+    return (key, _apply_table(data, _get_table(operator.add, key), minimum_length, byte_source))
+
+
+def deobfuscate_offset_mod(key, data):
+    """This function deobfuscates the data using a modulo-256 offset operation.
+
+    The formula used is: [(x - key) % 256 for x in data]
+
+    :param int key: The key used for the offset operation.
+    :param iterable data: The data you want to deobfuscate
+    """
+    return _apply_table(data, _get_table(operator.sub, key))
+
+
+def obfuscate_xor_multi(data, key=None, minimum_length=32, byte_source=None):
+    """This function obfuscates the data using an XOR operation with a repeating
+    multi-byte key.
+
+    The formula used is: [x ^ key[i % len(key)] for i, x in enumerate(data)]
+
+    Instead of working byte by byte, the data is XOR'ed against the tiled key
+    as large integers (`int.from_bytes`), `CHUNK_SIZE` bytes at a time.
+    Bytes-like data is returned as bytes; lists of ints are returned as lists.
+
+    :param iterable data: The data you want to obfuscate
+    :param bytes key: The key used for the XOR operation.  By default, the key
+        will be 8 random bytes between 1 and 255.  An int is used as a
+        single-byte key.
+    :param int minimum_length: The minimum number of bytes to return.  If the
+        encoding operation produces fewer bytes that this, random bytes are
+        appended to the end of the result so len(bytes) == minimum_length.
+    :param byte_source: A function that returns `count` random bytes, used for
+        the padding (see `random_bytes`)
+    """
+    key = _multi_key(key) if key else bytes(bytearray(random.randint(1, 255) for x in range(8)))
+    return (key, _xor_repeating(data, key, minimum_length, byte_source=byte_source))
+
+
+def deobfuscate_xor_multi(key, data):
+    """This function deobfuscates the data using an XOR operation with a
+    repeating multi-byte key.
+
+    The formula used is: [x ^ key[i % len(key)] for i, x in enumerate(data)]
+
+    :param bytes key: The key used for the XOR operation.
+    :param iterable data: The data you want to deobfuscate
+    """
+    return _xor_repeating(data, _multi_key(key))
+
+
+def _multi_key(key):
+    """Convert `key` into the bytes used by the repeating-key XOR encoder."""
+    if isinstance(key, int):
+        return bytes(bytearray([key]))
+    return bytes(key)
+
+
+def _key_schedule(key, size=CHUNK_SIZE, schedule=None):
+    """Return `(block size, mask)` used by `_xor_repeating` to process `size`
+    bytes with `key`.
+
+    Whole repetitions of the key are processed at a time so each block starts
+    at the beginning of the key; `mask` is the key tiled over a block.  The
+    block is `size` rounded up to a whole number of keys, up to `CHUNK_SIZE`,
+    so short data doesn't pay for a large mask.  Schedules are memoized per
+    key, evicting the least recently used one past `_MAX_SCHEDULES`; a larger
+    cached block is reused for smaller data.
+
+    :param schedule: A schedule previously returned for `key`, kept by the
+        caller (see `XorMultiCodec`).  It's reused or replaced instead of the
+        memoized one.
+    """
+    if not key:
+        raise ValueError("The key must not be empty")
+
+    block = min(max(size, 1), CHUNK_SIZE)
+    block += -block % len(key)
+    if schedule is not None:
+        if schedule[0] >= block:
+            return schedule
+        return (block, int.from_bytes(key * (block // len(key)), "little"))
+
+    schedule = _SCHEDULES.get(key)
+    if schedule is None or schedule[0] < block:
+        schedule = _SCHEDULES[key] = (block, int.from_bytes(key * (block // len(key)), "little"))
+        if len(_SCHEDULES) > _MAX_SCHEDULES:
+            _SCHEDULES.popitem(last=False)
+    _SCHEDULES.move_to_end(key)
+    return schedule
+
+
+def _xor_repeating(data, key, minimum_length=0, target=None, byte_source=None, schedule=None):
+    """XOR `data` with the repeating `key` (see `obfuscate_xor_multi`).
+
+    :param iterable data: The data you want to encode/decode
+    :param bytes key: The (non-empty) key
+    :param int minimum_length: The minimum number of bytes to return.
+    :param memoryview target: Write the result into this buffer and return the
+        number of bytes written, instead of returning a new object.  `target`
+        may be the same buffer as `data`.
+    :param byte_source: The source of the padding (see `random_bytes`)
+    :param schedule: The schedule to use (see `_key_schedule`); by default the
+        memoized one for `key` is used
+    """
+    as_list = not _is_buffer(data)
+    source = _byte_view(bytearray(data) if as_list else data)
+    length = len(source)
+    block, mask = _key_schedule(key, length, schedule)
+
+    total = max(length, minimum_length)
+    result = bytearray(total) if target is None else target
+    if len(result) < total:
+        raise ValueError("Output buffer is too small: %i < %i" % (len(result), total))
+
+    for start in range(0, length, block):
+        chunk = source[start:start + block]
+        size = len(chunk)
+        value = int.from_bytes(chunk, "little") ^ (mask if size == block else mask & ((1 << (8 * size)) - 1))
+        result[start:start + size] = value.to_bytes(size, "little")
+
+    result[length:total] = _random_bytes(total - length, byte_source)
+    if target is not None:
+        return total
+    elif as_list:
+        return list(result)
+    return result if isinstance(data, bytearray) else bytes(result)
+
+
+def obfuscate_rot13(data, key=None, minimum_length=32, byte_source=None):
     """This function performs a ROT13 encode on the data.  `data` needs
     to be an iterable that contains a representation of str types.  This can be
     either a string of type `str`, or a list of bytes from something like `ord`.
@@ -181,8 +1041,10 @@ def obfuscate_rot13(data, key=None, minimum_length=32):
     :param int minimum_length: The minimum number of bytes to return.  If the
         encoding operation produces fewer bytes that this, random bytes are
         appended to the end of the result so len(bytes) == minimum_length.
+    :param byte_source: A function that returns `count` random bytes, used for
+        the padding (see `random_bytes`)
     """
-    return rot13(data, minimum_length)
+    return rot13(data, minimum_length, byte_source)
 
 
 def deobfuscate_rot13(key, data):
@@ -198,45 +1060,43 @@ def deobfuscate_rot13(key, data):
     return bytes
 
 
-def rot13(data, minimum_length=32):
+def rot13(data, minimum_length=32, byte_source=None):
     """This function performs a ROT13 encode/decode on the data.  `data` needs
     to be an iterable that contains a representation of str types.  This can be
     either a string of type `str`, or a list of bytes from something like `ord`.
 
+    The whole input is translated in a single pass against `_ROT13_TABLE`.
+    Bytes-like data is returned as bytes; `str` data and lists of bytes are
+    returned as lists.
+
     :param iterable data: The data you want to obfuscate
     :param int minimum_length: The minimum number of bytes to return.  If the
         encoding operation produces fewer bytes that this, random bytes are
         appended to the end of the result so len(bytes) == minimum_length.
+    :param byte_source: A function that returns `count` random bytes, used for
+        the padding (see `random_bytes`)
     """
+    if type(data) is str:
+        data = bytearray(data.encode("utf-8"))
+        return (None, list(_translate(data, _ROT13_TABLE, minimum_length, byte_source)))
 
-    _from = "ABCDEFGHIJKLMabcdefghijklmNOPQRSTUVWXYZnopqrstuvwxyz"
-    _to = "NOPQRSTUVWXYZnopqrstuvwxyzABCDEFGHIJKLMabcdefghijklm"
+    return (None, _apply_table(data, _ROT13_TABLE, minimum_length, byte_source))
 
-    if sys.version_info.major == 2:
-        import string
 
-        if type(data) is str:
-            data = map(ord, data)
-
-        rot13t = string.maketrans(_from, _to)
-
-        def op(x, key):
-            return ord(string.translate(chr(x), rot13t))
-    else:
-        if type(data) is str:
-            data = bytes(data, encoding="utf-8")
-
-        _from = bytes(_from, encoding="utf-8")
-        _to = bytes(_to, encoding="utf-8")
-        rot13t = bytes.maketrans(_from, _to)
-
-        def op(x, key):
-                return ord(bytes.translate(bytes(chr(x), encoding="utf-8"), rot13t))
+def _make_rot13_table():
+    """Build the 256-byte ROT13 translation table; bytes outside of A-Z and a-z
+    are left unchanged.
+    """
+    table = bytearray(range(256))
+    for start in (ord("A"), ord("a")):
+        for offset in range(26):
+            table[start + offset] = start + (offset + 13) % 26
 
-    return (None, _encode_operation(data, 0, combinator=op, minimum_length=minimum_length))
+    return bytes(table)
 
 
 # Setup defaults and maps ######################################################
+_ROT13_TABLE = _make_rot13_table()
 
 # Map the encode / decode functions so we can store them in the binary file and
 # read them back.  This allows us to read an obfuscated file without knowing the
@@ -246,8 +1106,15 @@ FUNC_MAP = {
     1: [obfuscate_xor, deobfuscate_xor],
     2: [obfuscate_offset, deobfuscate_offset],
     3: [obfuscate_rot13, deobfuscate_rot13],
+    4: [obfuscate_xor_multi, deobfuscate_xor_multi],
+    5: [obfuscate_offset_mod, deobfuscate_offset_mod],
     obfuscate: 0,
     obfuscate_xor: 1,
     obfuscate_offset: 2,
-    obfuscate_rot13: 3
+    obfuscate_rot13: 3,
+    obfuscate_xor_multi: 4,
+    obfuscate_offset_mod: 5
 }
+
+# The codec registry needs FUNC_MAP, so it's imported last
+from .codec import Codec, get_codec, register_codec  # noqa: E402
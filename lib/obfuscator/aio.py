@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+This module contains an asyncio interface to obfuscated files.
+
+`AsyncObfuscatedFile` wraps an `ObfuscatedFile`, so the file format is exactly
+the same; the blocking disk I/O and decoding are run in an executor instead of
+on the event loop.  Files smaller than `INLINE_THRESHOLD` are handled inline,
+since handing them to an executor costs more than doing the work.
+
+Example::
+
+    >>> from obfuscator.aio import AsyncObfuscatedFile
+    >>> af = AsyncObfuscatedFile('data.bin')
+    >>> key = await af.write(b"my string")
+    >>> await af.read()
+    [109, 121, 32, 115, 116, 114, 105, 110, 103]
+    >>> async for chunk in af.iter_chunks():
+    ...     pass
+"""
+__author__ = "Timothy McFadden"
+__date__ = "10/18/2026"
+__copyright__ = "Timothy McFadden, 2014"
+__license__ = "GPLv2"
+__version__ = "1.0.0"
+# Imports ######################################################################
+import os
+import asyncio
+import functools
+
+from . import CHUNK_SIZE
+from .file import ObfuscatedFile
+
+# Globals ######################################################################
+INLINE_THRESHOLD = 64 * 1024  # Smaller payloads aren't worth an executor round-trip
+
+
+class AsyncObfuscatedFile(object):
+    """
+    :param str filename: The path of the file you want to read/write.
+    :param executor: The `concurrent.futures` executor used for the blocking
+        work.  By default, the event loop's default executor is used.
+    :param int max_concurrency: The maximum number of operations on this
+        object that may be running in the executor at once.
+    :param byte_source: The source of the padding and header noise (see
+        `ObfuscatedFile`)
+
+    This class is the asyncio counterpart of `ObfuscatedFile`; see that class
+    for the details of each operation.
+    """
+    def __init__(self, filename, executor=None, max_concurrency=4, byte_source=None):
+        self.file = ObfuscatedFile(filename, byte_source=byte_source)
+        self.executor = executor
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @property
+    def filename(self):
+        return self.file.filename
+
+    async def _run(self, size, func, *args, **kwargs):
+        """Call `func`; inline if `size` is small, otherwise in the executor."""
+        if size < INLINE_THRESHOLD:
+            return func(*args, **kwargs)
+
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def _file_size(self):
+        try:
+            return os.path.getsize(self.filename)
+        except OSError:
+            return 0
+
+    async def stat(self):
+        """Return the `FileStat` of the file (see `ObfuscatedFile.stat`)."""
+        return await self._run(INLINE_THRESHOLD, self.file.stat)
+
+    async def read(self, key=None, workers=None):
+        """Read and deobfuscate the file (see `ObfuscatedFile.read`)."""
+        return await self._run(self._file_size(), self.file.read, key=key, workers=workers)
+
+    async def read_range(self, offset, length=None, key=None, workers=None):
+        """Read and deobfuscate part of the payload (see
+        `ObfuscatedFile.read_range`).
+        """
+        size = self._file_size() if length is None else length
+        return await self._run(size, self.file.read_range, offset, length, key=key, workers=workers)
+
+    async def iter_chunks(self, key=None, chunk_size=CHUNK_SIZE):
+        """Iterate over the deobfuscated payload, `chunk_size` bytes at a time.
+
+        :param int key: The key used during `write()` (see `ObfuscatedFile.read`)
+        :param int chunk_size: The number of payload bytes in each chunk
+        """
+        stat = await self.stat()
+        if stat.compression:
+            # A compressed payload has to be decompressed from the start, so
+            # `read_stream` is driven one piece at a time
+            size = self._file_size()
+            pieces = self.file.read_stream(key, chunk_size)
+            try:
+                while True:
+                    piece = await self._run(size, next, pieces, None)
+                    if piece is None:
+                        return
+                    yield piece
+            finally:
+                pieces.close()
+
+        for offset in range(0, stat.length, chunk_size):
+            yield await self.read_range(offset, chunk_size, key=key)
+
+    async def write(self, data, key=None, minimum_length=32, encoder=0, byte_source=None, compression=None,
+                    chunked=None, checksum=True):
+        """Obfuscate the data and write it to the file (see
+        `ObfuscatedFile.write`).
+        """
+        return await self._run(
+            max(len(data), minimum_length), self.file.write, data, key=key, minimum_length=minimum_length,
+            encoder=encoder, byte_source=byte_source, compression=compression, chunked=chunked, checksum=checksum)
+
+    async def write_stream(self, source, key=None, minimum_length=32, chunk_size=CHUNK_SIZE, encoder=0,
+                           byte_source=None, compression=None, chunked=None, checksum=True):
+        """Write the data from a (blocking) file-like object or iterable of
+        chunks to the file (see `ObfuscatedFile.write_stream`).  The source is
+        always consumed in the executor.
+        """
+        return await self._run(
+            INLINE_THRESHOLD, self.file.write_stream, source, key=key, minimum_length=minimum_length,
+            chunk_size=chunk_size, encoder=encoder, byte_source=byte_source, compression=compression, chunked=chunked,
+            checksum=checksum)
@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+"""
+This module contains an archive of many named obfuscated records in one file.
+
+Each record is stored just like an `ObfuscatedFile` (header, masked payload and
+padding), so it keeps its own key and encoder.  The records are followed by an
+index, itself stored as a record, and a fixed-size trailer that points to the
+index::
+
+    [record 1][record 2]...[record N][index record][index offset][magic]
+
+Opening an archive only reads the trailer and the index; `get()` then reads a
+single record with one seek and one read.  `update()` writes the new records
+over the old index, then writes the new index and trailer; if that fails, the
+old index and trailer are put back.  A replaced record stays in the file as
+unused bytes until they outnumber the live ones, when the archive is
+compacted (see `compact()`).
+
+Example::
+
+    >>> from obfuscator.archive import ObfuscatedArchive
+    >>> archive = ObfuscatedArchive('data.oba')
+    >>> keys = archive.write([("user", b"me"), ("password", b"secret")])
+    >>> archive.names()
+    ['user', 'password']
+    >>> archive.get("password")
+    b'secret'
+"""
+__author__ = "Timothy McFadden"
+__date__ = "10/18/2026"
+__copyright__ = "Timothy McFadden, 2014"
+__license__ = "GPLv2"
+__version__ = "1.0.0"
+# Imports ######################################################################
+import os
+import shutil
+import struct
+import tempfile
+import collections
+
+from .file import ObfuscatedFile
+
+# Globals ######################################################################
+MAGIC = b"OBFA"
+_TRAILER = struct.Struct("!Q4s")  # index offset, MAGIC
+_ENTRY = struct.Struct("!QQH")  # record offset, record size, name length
+
+
+class ObfuscatedArchive(object):
+    """
+    :param str filename: The path of the archive you want to read/write.
+    :param byte_source: The source of the padding and header noise (see
+        `ObfuscatedFile`)
+
+    This class represents a single file holding many named obfuscated records.
+    If the file exists, its index is read when the object is created.
+    """
+    def __init__(self, filename, byte_source=None):
+        self.filename = filename
+        self._codec = ObfuscatedFile(filename, byte_source=byte_source)
+        self._index = collections.OrderedDict()  # name: (offset, size)
+        self._index_offset = 0
+        if os.path.isfile(filename) and os.path.getsize(filename):
+            self._load_index()
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def _load_index(self):
+        """Read the trailer and the index of the archive."""
+        with open(self.filename, 'rb') as fh:
+            end = fh.seek(0, os.SEEK_END) - _TRAILER.size
+            if end < 0:
+                raise ValueError("%s is not an obfuscated archive" % self.filename)
+
+            fh.seek(end)
+            (offset, magic) = _TRAILER.unpack(fh.read(_TRAILER.size))
+            if magic != MAGIC or offset > end:
+                raise ValueError("%s is not an obfuscated archive" % self.filename)
+
+            fh.seek(offset)
+            data = fh.read(end - offset)
+
+        entries = collections.OrderedDict()
+        try:
+            index = bytes(self._codec._decode_record(data))
+            position = 0
+            while position < len(index):
+                (start, size, count) = _ENTRY.unpack_from(index, position)
+                position += _ENTRY.size
+                entries[index[position:position + count].decode("utf-8")] = (start, size)
+                position += count
+        except (struct.error, ValueError, IndexError, TypeError):
+            raise ValueError("%s is not an obfuscated archive" % self.filename)
+
+        (self._index, self._index_offset) = (entries, offset)
+
+    def _pack_index(self, index, offset):
+        """Return `index` as a record, followed by the trailer pointing to
+        `offset`.
+        """
+        entries = bytearray()
+        for (name, (start, size)) in index.items():
+            name = name.encode("utf-8")
+            entries += _ENTRY.pack(start, size, len(name))
+            entries += name
+
+        _, header, bytes = self._codec._encode_record(entries, minimum_length=0)
+        return header + bytes + _TRAILER.pack(offset, MAGIC)
+
+    def _encode(self, records, key, minimum_length, encoder, byte_source, compression):
+        """Encode `records` as a list of `(name, key, record bytes)`."""
+        if hasattr(records, "items"):
+            records = records.items()
+
+        encoded = []
+        for (name, data) in records:
+            _key, header, bytes = self._codec._encode_record(
+                data, key, minimum_length, encoder, byte_source, compression=compression)
+            encoded.append((name, _key, header + bytes))
+        return encoded
+
+    def _append(self, fh, start, encoded, index):
+        """Write the encoded records, then the new index and trailer, at
+        `start`.
+
+        :returns: `(index, index offset)`
+        """
+        index = collections.OrderedDict(index)
+        fh.seek(start)
+        for (name, _, record) in encoded:
+            index.pop(name, None)
+            index[name] = (fh.tell(), len(record))
+            fh.write(record)
+
+        offset = fh.tell()
+        fh.write(self._pack_index(index, offset))
+        fh.truncate()
+        return (index, offset)
+
+    def names(self):
+        """Return the names of the records, in the order they were added."""
+        return list(self._index)
+
+    def get(self, name, key=None):
+        """Return the deobfuscated data of the record `name`.
+
+        :param str name: The name of the record
+        :param int key: The key used when the record was added (see
+            `ObfuscatedFile.read`)
+        :returns: The data as `bytes` (a list of ints for the offset encoder)
+        """
+        (start, size) = self._index[name]
+        with open(self.filename, 'rb') as fh:
+            fh.seek(start)
+            return self._codec._decode_record(fh.read(size), key=key)
+
+    def add(self, name, data, key=None, minimum_length=0, encoder=0, byte_source=None, compression=None):
+        """Add a record to the archive (see `ObfuscatedFile.write` for the
+        parameters).  An existing record with the same name is replaced in the
+        index; its bytes stay in the file until the archive is compacted.
+
+        :param str name: The name of the record
+        :returns: The key used to encode the record
+        """
+        return self.update([(name, data)], key, minimum_length, encoder, byte_source, compression)[name]
+
+    def update(self, records, key=None, minimum_length=0, encoder=0, byte_source=None, compression=None):
+        """Add several records to the archive; the index is only rewritten once.
+
+        Every record is encoded before the file is touched.  The new records
+        are written over the current index, followed by the new index and
+        trailer; if writing fails, the old index and trailer are written back.
+        When the replaced records take more space than the live ones, the
+        archive is compacted.
+
+        :param records: A mapping, or an iterable of `(name, data)` pairs
+        :returns: A dict of `{name: key}`
+        """
+        if not (os.path.isfile(self.filename) and os.path.getsize(self.filename)):
+            return self.write(records, key, minimum_length, encoder, byte_source, compression)
+
+        encoded = self._encode(records, key, minimum_length, encoder, byte_source, compression)
+        with open(self.filename, 'r+b') as fh:
+            start = self._index_offset
+            fh.seek(start)
+            saved = fh.read()  # The old index and trailer
+            try:
+                (index, offset) = self._append(fh, start, encoded, self._index)
+            except BaseException:
+                fh.seek(start)
+                fh.write(saved)
+                fh.truncate()
+                raise
+
+        (self._index, self._index_offset) = (index, offset)
+        live = sum(size for (_, size) in index.values())
+        if offset - live > live:
+            self.compact()
+        return dict((name, _key) for (name, _key, _) in encoded)
+
+    def compact(self):
+        """Rewrite the archive without the bytes of the replaced records.  The
+        records are copied as they are, so no key is needed.
+        """
+        source = open(self.filename, 'rb')
+        try:
+            def records():
+                for (name, (start, size)) in self._index.items():
+                    source.seek(start)
+                    yield (name, None, source.read(size))
+
+            (self._index, self._index_offset) = self._replace(records(), source)
+        finally:
+            source.close()
+
+    def write(self, records, key=None, minimum_length=0, encoder=0, byte_source=None, compression=None):
+        """Replace the contents of the archive with `records` (see `update()`).
+
+        The archive is written to a temporary file, which then replaces the
+        original, so a failure leaves the original untouched.
+
+        :returns: A dict of `{name: key}`
+        """
+        encoded = self._encode(records, key, minimum_length, encoder, byte_source, compression)
+        (self._index, self._index_offset) = self._replace(encoded)
+        return dict((name, _key) for (name, _key, _) in encoded)
+
+    def _replace(self, encoded, source=None):
+        """Write the iterable of `(name, key, record bytes)` to a temporary
+        file, which then replaces the archive.
+
+        :param source: A file object open on the archive, closed before it's
+            replaced
+        :returns: `(index, index offset)`
+        """
+        (fd, path) = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.filename)))
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                result = self._append(fh, 0, encoded, {})
+            if source is not None:
+                source.close()
+            if os.path.isfile(self.filename):
+                shutil.copymode(self.filename, path)
+            os.replace(path, self.filename)
+        except BaseException:
+            os.unlink(path)
+            raise
+        return result
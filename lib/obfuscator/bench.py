@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+"""
+This module measures the throughput of the library.
+
+Each case (every `FUNC_MAP` encoder, `ObfuscatedFile.write`/`read`, and the
+padding path) is run across a range of payload sizes, and the MB/s, ops/s,
+latency percentiles and peak memory of each run are reported::
+
+    python -m obfuscator.bench
+    python -m obfuscator.bench --sizes 1K,1M --case "encode-*" --json results.json
+    python -m obfuscator.bench --sizes 16M --case file-read --profile read.prof
+
+The JSON output can be diffed between releases.  The cases that build a list
+of ints (the offset encoder, and `ObfuscatedFile.read`) take about 8 bytes per
+payload byte, so they're skipped above `--list-limit`.
+"""
+__author__ = "Timothy McFadden"
+__date__ = "10/18/2026"
+__copyright__ = "Timothy McFadden, 2014"
+__license__ = "GPLv2"
+__version__ = "1.0.0"
+# Imports ######################################################################
+import os
+import sys
+import json
+import time
+import fnmatch
+import argparse
+import tempfile
+import platform
+import tracemalloc
+
+from . import FUNC_MAP, __version__ as library_version
+from .file import ObfuscatedFile
+
+# Globals ######################################################################
+DEFAULT_SIZES = "32,1K,64K,1M,16M"
+UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+LIST_LIMIT = "64M"  # Largest payload the list-based cases are run with
+LIST_CASES = ("encode-2", "decode-2", "file-read-list")  # Cases that build a list of ints
+
+
+def parse_size(text):
+    """Convert a size such as `32`, `64K`, `1M` or `1G` to a number of bytes."""
+    text = text.strip().upper().rstrip("B")
+    unit = text[-1:] if text[-1:] in UNITS else ""
+    return int(text[:len(text) - len(unit)]) * UNITS[unit]
+
+
+def _cases(path):
+    """Return `{name: setup}`; `setup(data)` returns the function to time."""
+    cases = {}
+    for encoder in sorted(x for x in FUNC_MAP if isinstance(x, int)):
+        encode, decode = FUNC_MAP[encoder]
+
+        def encode_setup(data, encode=encode):
+            return lambda: encode(data, None, 0)
+
+        def decode_setup(data, encode=encode, decode=decode):
+            key, encoded = encode(data, None, 0)
+            return lambda: decode(key, encoded)
+
+        cases["encode-%i" % encoder] = encode_setup
+        cases["decode-%i" % encoder] = decode_setup
+
+    def padding_setup(data):
+        return lambda: FUNC_MAP[0][0](b"x", None, len(data))
+
+    def write_setup(data):
+        ofile = ObfuscatedFile(path)
+        return lambda: ofile.write(data, minimum_length=0)
+
+    def read_setup(data):
+        ofile = ObfuscatedFile(path)
+        ofile.write(data, minimum_length=0)
+        return lambda: ofile.read_range(0)
+
+    def read_list_setup(data):
+        ofile = ObfuscatedFile(path)
+        ofile.write(data, minimum_length=0)
+        return ofile.read
+
+    cases["padding"] = padding_setup
+    cases["file-write"] = write_setup
+    cases["file-read"] = read_setup
+    cases["file-read-list"] = read_list_setup
+    return cases
+
+
+def _percentile(values, percent):
+    """Return the `percent` percentile of the sorted list `values`."""
+    return values[min(len(values) - 1, int(round(percent / 100.0 * (len(values) - 1))))]
+
+
+def run_case(func, size, min_time=0.2, max_repeat=1000):
+    """Time `func` until `min_time` seconds have passed (at least once, at most
+    `max_repeat` times), then measure its peak memory with one more call.
+
+    :returns: A dict of results
+    """
+    latencies = []
+    start = time.perf_counter()
+    while len(latencies) < max_repeat and (not latencies or time.perf_counter() - start < min_time):
+        before = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - before)
+
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    median = _percentile(latencies, 50)
+    return {
+        "size": size,
+        "repeat": len(latencies),
+        "mb_per_s": (size / (1024.0 * 1024.0)) / median if median else None,
+        "ops_per_s": len(latencies) / sum(latencies) if sum(latencies) else None,
+        "p50_ms": median * 1000,
+        "p90_ms": _percentile(latencies, 90) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "peak_bytes": peak,
+    }
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog="python -m obfuscator.bench", description="Measure the library's throughput")
+    parser.add_argument('--sizes', help="Comma-separated payload sizes (32, 1K, 1M, 1G...)", default=DEFAULT_SIZES)
+    parser.add_argument('--case', help="Only run the cases matching this pattern (e.g. 'encode-*')", default="*")
+    parser.add_argument('--min-time', help="Minimum seconds to spend on each run", type=float, default=0.2)
+    parser.add_argument('--list-limit', help="Skip the list-based cases (%s) above this size" % ", ".join(LIST_CASES),
+                        default=LIST_LIMIT)
+    parser.add_argument('--json', help="Write the results to this file ('-' for stdout)")
+    parser.add_argument('--profile', help="Dump cProfile stats for the selected cases to this file")
+    parser.add_argument('--list', help="List the cases and exit", action="store_true", default=False)
+    args = parser.parse_args(args)
+
+    (fh, path) = tempfile.mkstemp()
+    os.close(fh)
+    try:
+        cases = _cases(path)
+        names = [x for x in sorted(cases) if fnmatch.fnmatch(x, args.case)]
+        if args.list:
+            print("\n".join(names))
+            return 0
+
+        profiler = None
+        if args.profile:
+            import cProfile
+            profiler = cProfile.Profile()
+
+        results = []
+        list_limit = parse_size(args.list_limit)
+        for size in [parse_size(x) for x in args.sizes.split(",")]:
+            data = os.urandom(size)
+            for name in names:
+                if name in LIST_CASES and size > list_limit:
+                    results.append({"case": name, "size": size, "skipped": True})
+                    if args.json != "-":
+                        print("%-14s %10i B skipped (above --list-limit)" % (name, size))
+                    continue
+
+                func = cases[name](data)
+                if profiler:
+                    profiler.enable()
+                result = run_case(func, size, args.min_time)
+                if profiler:
+                    profiler.disable()
+                result["case"] = name
+                results.append(result)
+                if args.json != "-":
+                    print("%-14s %10i B %10.2f MB/s %10.1f ops/s  p50 %8.3f ms  p99 %8.3f ms  peak %10i B" % (
+                        name, size, result["mb_per_s"] or 0, result["ops_per_s"] or 0, result["p50_ms"],
+                        result["p99_ms"], result["peak_bytes"]))
+    finally:
+        os.unlink(path)
+
+    if profiler:
+        profiler.dump_stats(args.profile)
+
+    if args.json:
+        report = {
+            "version": library_version,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+        }
+        if args.json == "-":
+            json.dump(report, sys.stdout, indent=2, sort_keys=True)
+            print("")
+        else:
+            with open(args.json, 'w') as fh:
+                json.dump(report, fh, indent=2, sort_keys=True)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())  # pragma: no cover
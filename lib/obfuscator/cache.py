@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""
+This module contains a size-bounded LRU cache of decoded file contents.  It's
+bounded both by the number of entries and by their total size in memory.
+
+The cache is opt-in; assign one to `ObfuscatedFile.cache` to share it between
+all `ObfuscatedFile` objects (or to an instance's `cache` attribute to use it
+for that object only)::
+
+    >>> from obfuscator.cache import ReadCache
+    >>> from obfuscator.file import ObfuscatedFile
+    >>> ObfuscatedFile.cache = ReadCache(maxsize=32, maxbytes=64 * 1024 * 1024)
+    >>> ObfuscatedFile('data.bin').read()  # Read and decoded
+    >>> ObfuscatedFile('data.bin').read()  # Served from memory
+    >>> ObfuscatedFile.cache.info()
+    CacheInfo(hits=1, misses=1, evictions=0, size=1, maxsize=32, nbytes=1148, maxbytes=67108864)
+
+Each entry is keyed by the path and the key used to read the file, and
+remembers the inode, modification time and size of the file when it was read;
+if any of those change, the entry is dropped and the file is read again.
+"""
+__author__ = "Timothy McFadden"
+__date__ = "10/18/2026"
+__copyright__ = "Timothy McFadden, 2014"
+__license__ = "GPLv2"
+__version__ = "1.0.0"
+# Imports ######################################################################
+import os
+import sys
+import threading
+import collections
+
+# Globals ######################################################################
+CacheInfo = collections.namedtuple(
+    "CacheInfo", ["hits", "misses", "evictions", "size", "maxsize", "nbytes", "maxbytes"])
+MAXBYTES = 256 * 1024 * 1024  # Default bound on the memory held by a cache
+
+
+def _signature(path):
+    """Return `(inode, mtime, size)` of `path`, or None if it can't be read."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return (stat.st_ino, getattr(stat, "st_mtime_ns", stat.st_mtime), stat.st_size)
+
+
+class ReadCache(object):
+    """
+    :param int maxsize: The maximum number of entries
+    :param int maxbytes: The maximum memory held by the entries, as measured by
+        `sys.getsizeof` (a list of ints takes about 8 bytes per item).  Data
+        larger than this isn't cached.
+
+    The least recently used entries are evicted when a new one doesn't fit.
+    The cache is thread-safe.
+    """
+    def __init__(self, maxsize=128, maxbytes=MAXBYTES):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.hits = self.misses = self.evictions = 0
+        self.nbytes = 0
+        self._entries = collections.OrderedDict()  # (path, key, kind): (signature, data, size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, path, key, load, kind="data"):
+        """Return the decoded contents of `path` read with `key`; call `load()`
+        to read them if they aren't cached (or the file has changed).
+
+        :param str path: The path of the file
+        :param key: The key used to read the file
+        :param load: A function that reads and decodes the file
+        :param str kind: The form `load()` returns the contents in; each form
+            is cached separately
+        """
+        if key is not None and not isinstance(key, int):
+            key = bytes(key)  # A bytearray key isn't hashable
+        name = (os.path.abspath(path), key, kind)
+        signature = _signature(path)
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and signature is not None and entry[0] == signature:
+                self.hits += 1
+                self._entries.pop(name)
+                self._entries[name] = entry
+                return entry[1]
+            self.misses += 1
+
+        # The signature is taken before reading, so a change made while the file
+        # is being read is caught by the next `get()`.
+        data = load()
+        size = sys.getsizeof(data)
+        if signature is None or size > self.maxbytes:
+            return data
+
+        with self._lock:
+            self._drop(name)
+            self._entries[name] = (signature, data, size)
+            self.nbytes += size
+            while len(self._entries) > self.maxsize or self.nbytes > self.maxbytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+        return data
+
+    def _drop(self, name):
+        """Drop the entry `name`, if there is one.  Called with `_lock` held."""
+        entry = self._entries.pop(name, None)
+        if entry is not None:
+            self.nbytes -= entry[2]
+
+    def invalidate(self, path):
+        """Drop every entry of `path`."""
+        path = os.path.abspath(path)
+        with self._lock:
+            for name in [x for x in self._entries if x[0] == path]:
+                self._drop(name)
+
+    def clear(self):
+        """Drop every entry; the counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def info(self):
+        """Return the counters as a `CacheInfo`."""
+        with self._lock:
+            return CacheInfo(
+                self.hits, self.misses, self.evictions, len(self._entries), self.maxsize, self.nbytes, self.maxbytes)
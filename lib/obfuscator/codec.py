@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+"""
+This module contains the codec registry.
+
+A codec is an encoder bound to a key.  The per-key setup (translation tables,
+the tiled key of the repeating-key XOR) is done once and memoized, so encoding
+many pieces of data with the same key costs nothing beyond the encoding
+itself::
+
+    >>> from obfuscator import get_codec
+    >>> codec = get_codec("xor", 0x5A)
+    >>> for record in records:
+    ...     encoded = codec.encode(record, minimum_length=0)
+
+Custom codecs are subclasses of `Codec` registered with `register_codec`; they
+are added to `FUNC_MAP` too, so `obfuscate()`, `deobfuscate()` and
+`ObfuscatedFile` can store and dispatch on their ids.
+"""
+__author__ = "Timothy McFadden"
+__date__ = "10/18/2026"
+__copyright__ = "Timothy McFadden, 2014"
+__license__ = "GPLv2"
+__version__ = "1.0.0"
+# Imports ######################################################################
+import operator
+
+from . import (
+    FUNC_MAP, DEFAULT_ENCODER, _ROT13_TABLE, _apply_table, _translate_into, _byte_view, _get_table,
+    _encode_operation, _decode_operation, _is_buffer, _key_schedule, _multi_key, _xor_repeating)
+
+# Globals ######################################################################
+_CODECS = {}  # id or name: Codec subclass
+
+
+class Codec(object):
+    """The base class of the codecs.
+
+    Subclasses set `id` (the `FUNC_MAP` id stored in files, 0-255) and `name`,
+    and implement `encode` and `decode`; `encode_into`/`decode_into` are only
+    needed for encoders that produce bytes.  `ObfuscatedFile.read_range` decodes
+    any slice of the payload with the same key, so custom codecs must encode
+    each byte independently of its position.
+
+    :param key: The key; by default a random one is created (see `make_key`),
+        just like the `obfuscate_*` functions do.
+    """
+    __slots__ = ("key",)
+    id = None
+    name = None
+
+    def __init__(self, key=None):
+        self.key = key if key else self.make_key()
+
+    def __repr__(self):
+        return "<%s %s key=%r>" % (self.__class__.__name__, self.name, self.key)
+
+    @classmethod
+    def make_key(cls):
+        """Return a random key."""
+        return None
+
+    def encode(self, data, minimum_length=0, byte_source=None):
+        """Encode `data`; bytes-like data is returned as bytes, lists of ints as
+        lists.
+
+        :param iterable data: The data you want to encode
+        :param int minimum_length: The minimum number of bytes to return (see
+            `obfuscate`)
+        :param byte_source: The source of the padding (see `random_bytes`)
+        """
+        raise NotImplementedError
+
+    def decode(self, data):
+        """Decode `data` (see `encode()`)."""
+        raise NotImplementedError
+
+    def encode_into(self, source, target, minimum_length=0, byte_source=None):
+        """Encode the bytes-like `source` into the writable buffer `target`,
+        which may be the same buffer.
+
+        :returns: The number of bytes written
+        """
+        raise ValueError("The %s codec doesn't produce bytes" % self.name)
+
+    def decode_into(self, source, target):
+        """Decode the bytes-like `source` into the writable buffer `target` (see
+        `encode_into()`).
+        """
+        raise ValueError("The %s codec doesn't produce bytes" % self.name)
+
+
+class _TableCodec(Codec):
+    """A codec implemented by a pair of 256-byte translation tables."""
+    __slots__ = ("_encode_table", "_decode_table")
+
+    def encode(self, data, minimum_length=0, byte_source=None):
+        return _apply_table(data, self._encode_table, minimum_length, byte_source)
+
+    def decode(self, data):
+        return _apply_table(data, self._decode_table)
+
+    def encode_into(self, source, target, minimum_length=0, byte_source=None):
+        return _translate_into(source, _byte_view(target, writable=True), self._encode_table, minimum_length,
+                               byte_source)
+
+    def decode_into(self, source, target):
+        return _translate_into(source, _byte_view(target, writable=True), self._decode_table)
+
+
+class XorCodec(_TableCodec):
+    """Byte-wise XOR (see `obfuscate_xor`)."""
+    __slots__ = ()
+    id = 1
+    name = "xor"
+
+    def __init__(self, key=None):
+        super(XorCodec, self).__init__(key)
+        self._encode_table = self._decode_table = _get_table(operator.xor, self.key)
+
+    @classmethod
+    def make_key(cls):
+        return FUNC_MAP[cls.id][0](b"", None, 0)[0]
+
+
+class Rot13Codec(_TableCodec):
+    """ROT13 (see `obfuscate_rot13`); the key is ignored."""
+    __slots__ = ()
+    id = 3
+    name = "rot13"
+
+    def __init__(self, key=None):
+        super(Rot13Codec, self).__init__(key)
+        self._encode_table = self._decode_table = _ROT13_TABLE
+
+
+class OffsetCodec(Codec):
+    """Offset (see `obfuscate_offset`); the output doesn't fit in bytes."""
+    __slots__ = ()
+    id = 2
+    name = "offset"
+
+    @classmethod
+    def make_key(cls):
+        return FUNC_MAP[cls.id][0](b"", None, 0)[0]
+
+    def encode(self, data, minimum_length=0, byte_source=None):
+        return _encode_operation(data, self.key, operator.add, minimum_length, byte_source)
+
+    def decode(self, data):
+        return _decode_operation(data, self.key, operator.sub)
+
+
+class OffsetModCodec(_TableCodec):
+    """Modulo-256 offset (see `obfuscate_offset_mod`)."""
+    __slots__ = ()
+    id = 5
+    name = "offset_mod"
+
+    def __init__(self, key=None):
+        super(OffsetModCodec, self).__init__(key)
+        self._encode_table = _get_table(operator.add, self.key)
+        self._decode_table = _get_table(operator.sub, self.key)
+
+    @classmethod
+    def make_key(cls):
+        return FUNC_MAP[cls.id][0](b"", None, 0)[0]
+
+
+class XorMultiCodec(Codec):
+    """XOR with a repeating multi-byte key (see `obfuscate_xor_multi`).
+
+    The codec keeps its own key schedule, so it isn't rebuilt when many other
+    keys are in use.
+    """
+    __slots__ = ("_schedule",)
+    id = 4
+    name = "xor_multi"
+
+    def __init__(self, key=None):
+        super(XorMultiCodec, self).__init__(key)
+        self.key = _multi_key(self.key)
+        self._schedule = (0, 0)  # (block size, mask), grown as needed
+
+    def _schedule_for(self, data):
+        """Return the key schedule for `data`, growing the kept one if needed."""
+        size = len(_byte_view(data)) if _is_buffer(data) else len(data)
+        self._schedule = _key_schedule(self.key, size, self._schedule)
+        return self._schedule
+
+    @classmethod
+    def make_key(cls):
+        return FUNC_MAP[cls.id][0](b"", None, 0)[0]
+
+    def encode(self, data, minimum_length=0, byte_source=None):
+        return _xor_repeating(
+            data, self.key, minimum_length, byte_source=byte_source, schedule=self._schedule_for(data))
+
+    def decode(self, data):
+        return _xor_repeating(data, self.key, schedule=self._schedule_for(data))
+
+    def encode_into(self, source, target, minimum_length=0, byte_source=None):
+        return _xor_repeating(
+            source, self.key, minimum_length, _byte_view(target, writable=True), byte_source,
+            self._schedule_for(source))
+
+    def decode_into(self, source, target):
+        return _xor_repeating(
+            source, self.key, target=_byte_view(target, writable=True), schedule=self._schedule_for(source))
+
+
+def register_codec(cls, replace=False):
+    """Register the `Codec` subclass `cls` under its `id` and `name`, and add it
+    to `FUNC_MAP` so it can be used with `obfuscate(encoder=cls.id)` and
+    `ObfuscatedFile.write(encoder=cls.id)`.
+
+    :param cls: The codec class
+    :param bool replace: Allow replacing an existing codec with the same id
+    :returns: `cls`, so this can be used as a class decorator
+    """
+    if not (isinstance(cls.id, int) and 0 < cls.id <= 0xFF) or not cls.name:
+        raise ValueError("A codec needs an id between 1 and 255, and a name")
+    if (cls.id in FUNC_MAP or cls.name in _CODECS) and not replace:
+        raise ValueError("Codec %r (%i) is already registered" % (cls.name, cls.id))
+
+    def encode(data, key=None, minimum_length=32, byte_source=None):
+        codec = cls(key)
+        return (codec.key, codec.encode(data, minimum_length, byte_source))
+
+    def decode(key, data):
+        return cls(key).decode(data)
+
+    encode.__name__ = "obfuscate_%s" % cls.name
+    decode.__name__ = "deobfuscate_%s" % cls.name
+    _CODECS[cls.id] = _CODECS[cls.name] = cls
+    FUNC_MAP[cls.id] = [encode, decode]
+    FUNC_MAP[encode] = cls.id
+    return cls
+
+
+def get_codec(encoder, key=None):
+    """Return a codec for `encoder` bound to `key`.
+
+    :param encoder: The `FUNC_MAP` id or the name of the codec.  0 (or
+        `"default"`) is the default encoder.
+    :param key: The key; None creates a random one (available as `codec.key`)
+    """
+    if encoder in (0, "default"):
+        encoder = DEFAULT_ENCODER
+
+    try:
+        return _CODECS[encoder](key)
+    except KeyError:
+        raise ValueError("Unknown codec: %r" % (encoder,))
+
+
+for _cls in (XorCodec, OffsetCodec, Rot13Codec, XorMultiCodec, OffsetModCodec):
+    _CODECS[_cls.id] = _CODECS[_cls.name] = _cls
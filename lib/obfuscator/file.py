@@ -8,20 +8,163 @@ __copyright__ = "Timothy McFadden, 2014"
 __license__ = "GPLv2"
 __version__ = "1.0.4"
 # Imports ######################################################################
+import os
+import bz2
 import sys
+import mmap
+import bisect
+import zlib
 import struct
-import random
-from . import _get_encoder_type, _get_decoder
+import operator
+import collections
+from . import _get_decoder, _get_encoder, _get_table, _translate, _is_buffer, _chunk_key, _random_bytes, CHUNK_SIZE
+from . import _get_byte_table, _has_table, _resolve_encoder, FUNC_MAP
+from . import instrument
 
-if sys.version_info.major < 3:
-    def next(iterator):
-        return getattr(iterator, "next")()
-elif sys.version_info.major > 2:
-    import builtins
-    xrange = range
+try:
+    import lzma
+except ImportError:  # pragma: no cover
+    lzma = None
 
-    def map(*args):
-        return list(builtins.map(*args))
+# Globals ######################################################################
+
+# The decoded header of a file (see `ObfuscatedFile._read_header`)
+_Header = collections.namedtuple(
+    "_Header",
+    ["key", "length", "encoder", "var4", "size", "version", "key_stored", "compression", "chunk_size", "checksum"])
+
+# The metadata of a file (see `ObfuscatedFile.stat`)
+FileStat = collections.namedtuple(
+    "FileStat", ["length", "encoder", "key_stored", "version", "padding", "compression", "chunk_size"])
+
+# An entry of the chunk table of a chunked file (see `ObfuscatedFile.chunk_table`)
+ChunkInfo = collections.namedtuple("ChunkInfo", ["offset", "length", "size", "crc"])
+_CHUNK_ENTRY = struct.Struct("!QIII")  # ChunkInfo
+_CHUNK_COUNT = struct.Struct("!I")
+
+# The payload length stored when writing to a pipe (see `write_stream`); the
+# payload then runs to the end of the file.
+_UNKNOWN_LENGTH = 0xFFFFFFFFFFFFFFFF
+
+# The compression algorithms that can be applied before the encoder, and the ids
+# stored in the header
+COMPRESSION = {"zlib": 1, "bz2": 2, "lzma": 3}
+
+
+def _compressor(compression):
+    """Return a new compressor object (with `compress()` and `flush()`) for the
+    algorithm named `compression`.
+    """
+    if compression == "zlib":
+        return zlib.compressobj()
+    elif compression == "bz2":
+        return bz2.BZ2Compressor()
+    elif compression == "lzma" and lzma is not None:
+        return lzma.LZMACompressor()
+    raise ValueError("Unsupported compression: %r" % compression)
+
+
+def _decompress(compression, data):
+    """Decompress `data` with the algorithm named `compression`."""
+    if compression == "zlib":
+        return zlib.decompress(data)
+    elif compression == "bz2":
+        return bz2.decompress(data)
+    elif compression == "lzma" and lzma is not None:
+        return lzma.decompress(data)
+    raise ValueError("Unsupported compression: %r" % compression)
+
+
+def _decompressor(compression):
+    """Return a new decompressor object (with `decompress()`) for the
+    algorithm named `compression`.
+    """
+    if compression == "zlib":
+        return zlib.decompressobj()
+    elif compression == "bz2":
+        return bz2.BZ2Decompressor()
+    elif compression == "lzma" and lzma is not None:
+        return lzma.LZMADecompressor()
+    raise ValueError("Unsupported compression: %r" % compression)
+
+
+def _decompress_pieces(decompressor, data, size):
+    """Feed `data` to `decompressor`, and yield the output in pieces of at most
+    `size` bytes, so compressible data doesn't blow up in memory.
+    """
+    if hasattr(decompressor, "unconsumed_tail"):  # zlib
+        while data:
+            yield decompressor.decompress(data, size)
+            data = decompressor.unconsumed_tail
+        return
+
+    yield decompressor.decompress(data, size)
+    while not (decompressor.needs_input or decompressor.eof):
+        yield decompressor.decompress(b"", size)
+
+
+def _seekable(fileobj):
+    """Return True if the file object `fileobj` supports `seek()`."""
+    try:
+        return fileobj.seekable()
+    except AttributeError:  # pragma: no cover
+        try:
+            fileobj.tell()
+        except IOError:
+            return False
+        return True
+
+
+def _compress_chunks(chunks, compression):
+    """Compress the iterable of bytes-like `chunks` as a single stream."""
+    compressor = _compressor(compression)
+    for chunk in chunks:
+        chunk = compressor.compress(bytes(chunk) if _is_buffer(chunk) else bytes(bytearray(chunk)))
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+
+def _rechunk(chunks, size):
+    """Regroup the iterable of bytes-like `chunks` into pieces of exactly `size`
+    bytes (the last piece may be shorter).
+    """
+    pending = bytearray()
+    for chunk in chunks:
+        view = memoryview(chunk if _is_buffer(chunk) else bytearray(chunk)).cast("B")
+        if pending:
+            count = size - len(pending)
+            pending += view[:count]
+            view = view[count:]
+            if len(pending) < size:
+                continue
+            yield bytes(pending)
+            pending = bytearray()
+
+        start = 0
+        while len(view) - start >= size:
+            yield view[start:start + size]
+            start += size
+        pending += view[start:]
+
+    if pending:
+        yield bytes(pending)
+
+
+def _join(parts):
+    """Join decoded pieces of data; lists (from the offset encoder) stay lists."""
+    if parts and not _is_buffer(parts[0]):
+        return [x for part in parts for x in part]
+    return b"".join(parts)
+
+
+def _read_chunks(fileobj, chunk_size=CHUNK_SIZE):
+    """Yield `chunk_size` blocks from the file-like `fileobj` until it's empty."""
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
 
 
 class ObfuscatedFile(object):
@@ -62,29 +205,53 @@ class ObfuscatedFile(object):
         'my string'
         >>>
 
+    Example #3 - Storing text directly::
+
+        >>> from obfuscator.file import ObfuscatedFile
+        >>> of = ObfuscatedFile('data.bin')
+        >>> key = of.write_text(u"my string")
+        >>> of.read_text()
+        'my string'
+
     """
 
-    size = 5  # Number of bytes in the header
+    size = 5  # Number of bytes in the legacy (version 1) header
+    size_v2 = 13  # Number of bytes in the version 2 header (64-bit length)
+
+    # Tags of the fields stored in a version 3 header
+    FIELD_ENCODER = 1
+    FIELD_KEY = 2
+    FIELD_COMPRESSION = 3
+    FIELD_CHUNKS = 4
 
-    def __init__(self, filename):
+    # An optional `obfuscator.cache.ReadCache` of the data returned by `read()`
+    cache = None
+
+    def __init__(self, filename, byte_source=None):
         """
         :param str filename: The path of the file you want to read/write.
+        :param byte_source: A function that returns `count` random bytes, used
+            for the padding and the header noise (see `obfuscator.random_bytes`)
         """
         self.__CONST_NUM = 0x8343353C
         self.__CONST_NUMS = [0x00, 0x9C, 0x38, 0x34, 0x42, 0x4F, 0x39]
+        self.__CONST_LEN = 0x4F39C3839C343542
         self.filename = filename
+        self.byte_source = byte_source
 
-    def __encode(self, var1, var2, var3, var4=None):
-        """Convert the variables into 2 32-bit integers."""
-        s = var4 if var4 is not None else random.randint(1, 6)
+    def __encode(self, var1, var2, var3, var4=None, extended=False, byte_source=None):
+        """Convert the variables into 2 32-bit integers.  If `extended` is set,
+        an otherwise unused bit is set to mark a versioned header."""
+        noise = struct.unpack("!Q", _random_bytes(8, byte_source or self.byte_source))[0]
+        s = var4 if var4 is not None else 1 + (noise & 0xFF) % 6
 
         bytes = [0, 0, 0, 0, 0]
-        r = (random.randint(0, 1) for _ in xrange(1, 64))
+        r = ((noise >> x) & 1 for x in range(8, 64))
         bytes[0] = (var1 & 0xC0) | next(r) << 5 | (var2 & 0xC0) >> 3 | next(r) << 2 | (var2 & 0x30) >> 4
         bytes[1] = (var1 & 0x30) << 2 | next(r) << 5 | (var2 & 0x0F) << 1 | next(r)
         bytes[2] = (var1 & 0x08) << 4 | next(r) << 6 | (var1 & 0x07) << 3 | next(r) << 2 | next(r) << 1 | next(r)
         bytes[3] = next(r) << 7 | (var3 & 0x04) << 4 | next(r) << 5 | (var3 & 0x03) << 3 | next(r) << 2 | next(r) << 1 | next(r)
-        bytes[4] = next(r) << 7 | next(r) << 6 | (s & 4) << 3 | next(r) | (s & 3) << 2 | next(r) << 1 | next(r)
+        bytes[4] = next(r) << 7 | next(r) << 6 | (s & 4) << 3 | bool(extended) << 4 | next(r) | (s & 3) << 2 | next(r) << 1 | next(r)
 
         return (
             (bytes[0] << 24 | bytes[1] << 16 | bytes[2] << 8 | bytes[3]) ^ self.__CONST_NUM,
@@ -110,24 +277,212 @@ class ObfuscatedFile(object):
 
         return (var1, var2, var3, var4)
 
-    def _encode_to_numbers(self, var1, data):
-        from . import obfuscate
+    def __is_extended(self, numbers):
+        """Return True if the numbers represent a versioned (v2+) header."""
+        return bool((numbers[1] ^ self.__CONST_NUM) & 0x10)
+
+    def _encode_to_numbers(self, var1, length, version=None, encoder=0, byte_source=None, key_stored=False):
+        """Create the header numbers for a payload of `length` bytes.
+
+        Payloads longer than 0xFF bytes need a version 2+ header; the 8-bit
+        length field then holds the header version (and a flag telling whether
+        the key is stored), and the real length follows (see `_pack_header`).
+        By default, the smallest version that can hold `length` is used.
+        """
         var1 = var1 if var1 is not None else 0
-        var2 = len(data)
-        var3 = _get_encoder_type(obfuscate)
-        return self.__encode(var1, var2, var3)
+        var3 = encoder if encoder <= 0x07 else 0
+        version = version or (1 if length <= 0xFF else 2)
+        if version > 1:
+            var2 = version | (0x80 if key_stored else 0)
+            return self.__encode(var1, var2, var3, extended=True, byte_source=byte_source)
+        return self.__encode(var1, length, var3, byte_source=byte_source)
 
-    def _pack_header(self, numbers):
-        """Create the bytes of the header for the file."""
-        return struct.pack("!1I1B", *numbers)
+    def _make_header(self, key, length, encoder=0, version=None, byte_source=None, compression=None, chunks=None):
+        """Return the `(numbers, fields)` that describe a payload.
 
-    def _unpack_header(self, barray, key=None):
-        """Decode the file header."""
-        numbers = (barray[0] << 24 | barray[1] << 16 | barray[2] << 8 | barray[3], barray[4])
+        Keys that don't fit in the 8-bit key field (e.g. the multi-byte XOR key),
+        encoder ids that don't fit in the 3-bit encoder field and the
+        compression algorithm are stored as fields of a version 3 header.
+
+        :param key: The key to store in the file, or None to store a random byte
+        :param int length: The payload length
+        :param int encoder: The `FUNC_MAP` id of the encoder
+        :param int version: The minimum header version
+        :param byte_source: The source of the header noise
+        :param str compression: The compression algorithm (see `COMPRESSION`)
+        :param tuple chunks: `(chunk size, checksum)` of a chunked payload
+        """
+        fields = {}
+        key_stored = key is not None
+        if encoder > 0x07:
+            fields[self.FIELD_ENCODER] = bytes(bytearray([encoder]))
+        if compression:
+            fields[self.FIELD_COMPRESSION] = bytes(bytearray([COMPRESSION[compression]]))
+        if chunks:
+            fields[self.FIELD_CHUNKS] = struct.pack("!IB", chunks[0], 1 if chunks[1] else 0)
+        if key_stored and not isinstance(key, int):
+            fields[self.FIELD_KEY] = bytes(key)
+            key = None
+
+        if key is None:
+            key = 1 + bytearray(_random_bytes(1, byte_source or self.byte_source))[0] % 255
+
+        version = 3 if fields else version
+        return (self._encode_to_numbers(key, length, version, encoder, byte_source, key_stored), fields)
+
+    def _pack_header(self, numbers, length=None, fields=None):
+        """Create the bytes of the header for the file.
+
+        Version 2+ headers are followed by the 64-bit payload length.  Version 3
+        headers are then followed by a 16-bit size and a list of masked
+        `(tag, size, value)` fields.
+
+        :param tuple numbers: The numbers returned by `_encode_to_numbers`
+        :param int length: The payload length; only stored in version 2+ headers
+        :param dict fields: The fields of a version 3 header, by tag
+        """
+        header = struct.pack("!1I1B", *numbers)
+        if self.__is_extended(numbers):
+            header += struct.pack("!Q", length ^ self.__CONST_LEN)
+        if fields:
+            _, _, _, var4 = self.__decode(numbers)
+            extension = b"".join(
+                struct.pack("!BB", tag, len(value)) + value for (tag, value) in sorted(fields.items()))
+            header += struct.pack("!H", len(extension) ^ (self.__CONST_NUM & 0xFFFF))
+            header += self.__mask(extension, var4)
+        return header
+
+    def _unpack_numbers(self, barray):
+        """Convert the first header bytes back into the 2 header numbers."""
+        return (barray[0] << 24 | barray[1] << 16 | barray[2] << 8 | barray[3], barray[4])
+
+    def _unpack_fields(self, extension):
+        """Convert the unmasked extension of a version 3 header into a dict of
+        fields, by tag."""
+        fields = {}
+        index = 0
+        while index + 2 <= len(extension):
+            tag, size = extension[index], extension[index + 1]
+            fields[tag] = bytes(extension[index + 2:index + 2 + size])
+            index += 2 + size
+        return fields
+
+    def __check_length(self, barray, size):
+        """Raise a ValueError if `barray` is shorter than the `size` bytes the
+        header needs, e.g. when the file is empty."""
+        if len(barray) < size:
+            raise ValueError("Not an obfuscated file (truncated header)")
+
+    def __extension_size(self, barray):
+        """Return the size of the fields of a version 3 header."""
+        return struct.unpack("!H", bytes(barray[self.size_v2:self.size_v2 + 2]))[0] ^ (self.__CONST_NUM & 0xFFFF)
+
+    def _read_header(self, barray, key=None):
+        """Decode the file header.  The legacy 5-byte header and the version 2
+        and 3 headers are supported.
+
+        :param barray: The start of the file (at least the whole header)
+        :param key: The key passed in by the user, if any
+        :returns: A `_Header`.  `key_stored` is None for legacy headers, which
+            don't record whether the key is stored.
+        :raises ValueError: If `barray` doesn't start with a valid header
+        """
+        self.__check_length(barray, self.size)
+        numbers = self._unpack_numbers(barray)
         var1, var2, var3, var4 = self.__decode(numbers)
-        return (key if key else var1, var2, var3, var4)
+        if var4 >= len(self.__CONST_NUMS):
+            raise ValueError("Not an obfuscated file (bad header)")
+        size = self.size
+        version = 1
+        key_stored = None
+        fields = {}
+        if self.__is_extended(numbers):
+            version = var2 & 0x7F
+            key_stored = bool(var2 & 0x80)
+            if version not in (2, 3):
+                raise ValueError("Unsupported header version: %i" % version)
+
+            self.__check_length(barray, self.size_v2 + (2 if version == 3 else 0))
+            var2 = struct.unpack("!Q", bytes(barray[self.size:self.size_v2]))[0] ^ self.__CONST_LEN
+            size = self.size_v2
+            if version == 3:
+                count = self.__extension_size(barray)
+                self.__check_length(barray, size + 2 + count)
+                fields = self._unpack_fields(self.__mask(barray[size + 2:size + 2 + count], var4))
+                size += 2 + count
+
+        try:
+            if self.FIELD_ENCODER in fields:
+                var3 = bytearray(fields[self.FIELD_ENCODER])[0]
+            var1 = fields.get(self.FIELD_KEY, var1)
+            compression = None
+            if self.FIELD_COMPRESSION in fields:
+                number = bytearray(fields[self.FIELD_COMPRESSION])[0]
+                compression = dict((v, k) for (k, v) in COMPRESSION.items()).get(number, number)
+            (chunk_size, checksum) = (0, False)
+            if self.FIELD_CHUNKS in fields:
+                (chunk_size, flags) = struct.unpack("!IB", fields[self.FIELD_CHUNKS])
+                checksum = bool(flags & 1)
+        except (IndexError, struct.error):
+            raise ValueError("Not an obfuscated file (bad header field)")
+        if var3 not in FUNC_MAP:
+            raise ValueError("Not an obfuscated file (unknown encoder %i)" % var3)
+        return _Header(
+            key if key else var1, var2, var3, var4, size, version, key_stored, compression, chunk_size, checksum)
+
+    def _read_header_from(self, fh, key=None):
+        """Read and decode just the header from the open file `fh`; nothing
+        past the header is read, so `fh` may be a pipe.
+        """
+        barray = bytearray(fh.read(self.size))
+        self.__check_length(barray, self.size)
+        numbers = self._unpack_numbers(barray)
+        if self.__is_extended(numbers):
+            barray += fh.read(self.size_v2 - self.size)
+            if (self.__decode(numbers)[1] & 0x7F) == 3:
+                barray += fh.read(2)
+                self.__check_length(barray, self.size_v2 + 2)
+                barray += fh.read(self.__extension_size(barray))
+        return self._read_header(barray, key=key)
 
-    def read(self, key=None):
+    def _unpack_header(self, barray, key=None):
+        """Decode the file header; `var2` is always the payload length."""
+        return self._read_header(barray, key=key)[:4]
+
+    def stat(self):
+        """Return the metadata of the file, without reading or decoding the
+        payload.
+
+        :returns: A `FileStat` with the payload `length` (as stored, i.e.
+            after compression), the `encoder` id, whether the key is stored in
+            the file (`key_stored`; None for legacy headers, which can't tell),
+            the header `version`, the number of `padding` bytes, the
+            `compression` algorithm (or None), and the `chunk_size` of a
+            chunked file (or 0).
+        """
+        with open(self.filename, 'rb') as fh:
+            header = self._read_header_from(fh)
+            size = os.fstat(fh.fileno()).st_size
+            if header.length == _UNKNOWN_LENGTH:
+                header = header._replace(length=size - header.size)
+            padding = size - header.size - header.length
+            if header.chunk_size:
+                fh.seek(header.size + header.length)
+                count = _CHUNK_COUNT.unpack(self.__mask(fh.read(_CHUNK_COUNT.size), header.var4))[0]
+                padding -= _CHUNK_COUNT.size + count * _CHUNK_ENTRY.size
+
+        return FileStat(
+            header.length, header.encoder, header.key_stored, header.version, max(0, padding), header.compression,
+            header.chunk_size)
+
+    def __mask(self, data, var4):
+        """XOR the bytes-like `data` with the header constant selected by `var4`.
+        The operation is its own inverse, so it's used to both mask and unmask
+        the payload.
+        """
+        return _translate(data, _get_table(operator.xor, self.__CONST_NUMS[var4]))
+
+    def read(self, key=None, workers=None):
         """This function reads a file written by `write`, and returns the
         deobfuscated data.
 
@@ -135,64 +490,634 @@ class ObfuscatedFile(object):
             key during `write()`, you *must* use the same key here; the key will not
             be stored in the file.  If you let the algorithm choose the key, it is
             stored in the file, and will be used during `read()`.
+        :param int workers: Decode the chunks of a chunked file in parallel:
+            with this many processes for the table encoders (XOR, ROT13 and the
+            modulo-256 offset) when the payload isn't compressed, and with this
+            many threads when it is
+        """
+        if self.cache is None:
+            return list(self.read_range(0, key=key, workers=workers))
+
+        # The list itself is cached; a copy is returned, so changing it doesn't
+        # change the cache
+        load = lambda: list(self.read_range(0, key=key, workers=workers))
+        return self.cache.get(self.filename, key, load, kind="list")[:]
+
+    def _read_all(self, key=None, workers=None):
+        """Return the whole decoded payload, from the cache if there is one."""
+        if self.cache is None:
+            return self.read_range(0, key=key, workers=workers)
+        return self.cache.get(self.filename, key, lambda: self.read_range(0, key=key, workers=workers))
+
+    def read_text(self, key=None, encoding="utf-8", workers=None):
+        """Read a file written by `write_text`, and return the text as `str`.
+
+        :param int key: The key used during `write_text()` (see `read()`)
+        :param str encoding: The encoding used during `write_text()`
+        :param int workers: See `read()`
+        """
+        data = self._read_all(key, workers)
+        return (data if _is_buffer(data) else bytes(bytearray(data))).decode(encoding)
+
+    def read_range(self, offset, length=None, key=None, workers=None):
+        """This function reads `length` bytes of the payload, starting at
+        `offset`, and returns the deobfuscated data.
+
+        The file is memory-mapped, and only the requested window of the payload
+        is copied and decoded, so reading a small slice of a large file is cheap.
+        Unlike `read()`, the data is returned as `bytes` (a list of ints is
+        returned for the offset encoder).  A compressed payload has to be
+        decompressed from the start, so the whole payload is decoded; in a
+        chunked file, only the chunks holding the window are.
+
+        :param int offset: The payload offset to start reading from
+        :param int length: The maximum number of bytes to read.  By default, the
+            rest of the payload is read.
+        :param int key: The key used during `write()` (see `read()`)
+        :param int workers: Decode the chunks of a chunked file in parallel (see
+            `read()`)
+        """
+        if offset < 0 or (length is not None and length < 0):
+            raise ValueError("offset and length must not be negative")
+
+        timer = instrument.Timer() if instrument.ENABLED else None
+        with open(self.filename, 'rb') as fh:
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if timer:
+            timer.mark("open")
+
+        try:
+            return self._decode_record(mapped, offset, length, key, timer, workers)
+        finally:
+            mapped.close()
+
+    def _decode_record(self, buf, offset=0, length=None, key=None, timer=None, workers=None):
+        """Decode `length` bytes of the payload of the record (header, payload
+        and padding) held in `buf`, starting at `offset`.  Only that window of
+        `buf` is copied.
+
+        If an `instrument.Timer` is given, the read is recorded.
+        """
+        header = self._read_header(buf, key=key)
+        if header.length == _UNKNOWN_LENGTH:
+            header = header._replace(length=len(buf) - header.size)
+        if timer:
+            timer.mark("header")
+
+        if header.chunk_size:
+            result = self._decode_chunks(buf, header, offset, length, workers)
+            size = len(result)
+        else:
+            if header.compression:
+                (start, end) = (0, header.length)
+            else:
+                start = offset = min(offset, header.length)
+                end = header.length if length is None else min(header.length, offset + length)
+
+            data = self.__mask(buf[header.size + start:header.size + end], header.var4)
+            result = _get_decoder(header.encoder)(_chunk_key(header.encoder, header.key, start), data)
+            size = len(data)
+            if header.compression:
+                result = _decompress(header.compression, result if _is_buffer(result) else bytes(bytearray(result)))
+                result = result[offset:] if length is None else result[offset:offset + length]
+
+        if timer:
+            timer.mark("decode")
+            instrument.record("read", _resolve_encoder(header.encoder), size, len(result), timer)
+
+        return result
+
+    def _read_chunk_table(self, buf, header):
+        """Return the list of `ChunkInfo` of the chunked record in `buf`."""
+        start = header.size + header.length
+        count = _CHUNK_COUNT.unpack(self.__mask(buf[start:start + _CHUNK_COUNT.size], header.var4))[0]
+        start += _CHUNK_COUNT.size
+        table = self.__mask(buf[start:start + count * _CHUNK_ENTRY.size], header.var4)
+        return [ChunkInfo(*_CHUNK_ENTRY.unpack_from(table, x * _CHUNK_ENTRY.size)) for x in range(count)]
+
+    def _read_sample(self, size):
+        """Return `(header, sample)`: the header, and up to `size` bytes from the
+        start of the payload (of the first chunk, in a chunked file), unmasked
+        but not decoded.  Used by `obfuscator.recover`.
         """
         with open(self.filename, 'rb') as fh:
-            ba = bytearray(fh.read())
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            header = self._read_header(mapped)
+            if header.length == _UNKNOWN_LENGTH:
+                header = header._replace(length=len(mapped) - header.size)
+            (start, end) = (0, header.length)
+            if header.chunk_size:
+                table = self._read_chunk_table(mapped, header)
+                (start, end) = (table[0].offset, table[0].offset + table[0].length) if table else (0, 0)
+            end = min(end, start + size)
+            return (header, self.__mask(mapped[header.size + start:header.size + end], header.var4))
+        finally:
+            mapped.close()
+
+    def _verify_chunk(self, stored, header, chunk, index):
+        """Raise a ValueError if the file has checksums, and the stored bytes of
+        the chunk don't match its CRC-32."""
+        if header.checksum and (zlib.crc32(stored) & 0xFFFFFFFF) != chunk.crc:
+            raise ValueError("Chunk %i of %s is corrupt" % (index, self.filename))
+
+    def _decode_chunk(self, buf, header, chunk, index=0):
+        """Verify (if the file has checksums) and decode one chunk."""
+        stored = buf[header.size + chunk.offset:header.size + chunk.offset + chunk.length]
+        self._verify_chunk(stored, header, chunk, index)
+
+        result = _get_decoder(header.encoder)(header.key, self.__mask(stored, header.var4))
+        if header.compression:
+            result = _decompress(header.compression, result if _is_buffer(result) else bytes(bytearray(result)))
+        return result
+
+    def _translate_chunks(self, buf, header, table, indexes, workers=None):
+        """Verify and decode the consecutive chunks `indexes` of an uncompressed
+        payload whose encoder is a translation table.  The chunks are copied
+        once, and unmasked and decoded by a single combined table; with
+        `workers`, windows of `parallel.TABLE_THRESHOLD` bytes or more are
+        translated by that many processes.
+        """
+        (first, last) = (table[indexes[0]], table[indexes[-1]])
+        stored = buf[header.size + first.offset:header.size + last.offset + last.length]
+        if header.checksum:
+            with memoryview(stored) as view:
+                for index in indexes:
+                    start = table[index].offset - first.offset
+                    self._verify_chunk(view[start:start + table[index].length], header, table[index], index)
+
+        codes = _get_table(operator.xor, self.__CONST_NUMS[header.var4]).translate(
+            _get_byte_table(header.encoder, header.key, decode=True))
+        if workers and workers > 1:
+            from . import parallel
+            if len(stored) >= parallel.TABLE_THRESHOLD:
+                return parallel.translate(stored, codes, workers)
+        return stored.translate(codes)
+
+    def _decode_chunks(self, buf, header, offset, length, workers=None):
+        """Decode `length` bytes of a chunked payload, starting at `offset`;
+        only the chunks holding that window are decoded.
+
+        `bytes.translate` holds the GIL, so threads can't speed up the decoding
+        itself: uncompressed payloads of the table encoders are decoded by
+        processes (see `_translate_chunks`), and compressed chunks by threads,
+        since the decompressors release the GIL.  Other payloads are decoded
+        in the calling thread.
+        """
+        table = self._read_chunk_table(buf, header)
+        starts = [0]
+        for chunk in table:
+            starts.append(starts[-1] + chunk.size)
+
+        offset = min(offset, starts[-1])
+        end = starts[-1] if length is None else min(starts[-1], offset + length)
+        first = max(0, bisect.bisect_right(starts, offset) - 1)
+        last = bisect.bisect_left(starts, end)
+        indexes = range(first, min(last, len(table)))
 
-        (var1, var2, var3, var4) = self._unpack_header(ba, key=key)
-        decoder = _get_decoder(var3)
-        ba_data = ba[self.size:self.size + var2]
-        data = [x ^ self.__CONST_NUMS[var4] for x in ba_data]
-        bytes = decoder(var1, data)
+        def decode(index):
+            return self._decode_chunk(buf, header, table[index], index)
+
+        if indexes and not header.compression and _has_table(header.encoder):
+            result = self._translate_chunks(buf, header, table, indexes, workers)
+        elif header.compression and workers and workers > 1 and len(indexes) > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                result = _join(list(pool.map(decode, indexes)))
+        else:
+            result = _join([decode(x) for x in indexes])
+
+        start = offset - starts[first]
+        return result[start:start + end - offset]
+
+    def chunk_table(self):
+        """Return the chunk table of a chunked file (see `write()`) as a list of
+        `ChunkInfo`: the `offset` and stored `length` of each chunk within the
+        payload, its decoded `size`, and its `crc` (0 without checksums).
+        """
+        with open(self.filename, 'rb') as fh:
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
 
-        return bytes
+        try:
+            header = self._read_header(mapped)
+            if not header.chunk_size:
+                raise ValueError("%s is not a chunked file" % self.filename)
+            return self._read_chunk_table(mapped, header)
+        finally:
+            mapped.close()
 
-    def write(self, data, key=None, minimum_length=32):
+    def read_stream(self, key=None, chunk_size=CHUNK_SIZE, source=None):
+        """Read the file and yield the deobfuscated data in pieces, without
+        holding all of it in memory.  Bytes-like pieces are yielded (lists of
+        ints for the offset encoder).
+
+        :param int key: The key used during `write()` (see `read()`)
+        :param int chunk_size: The number of bytes read at a time, and the
+            maximum size of the decompressed pieces
+        :param source: A binary file object to read from instead of the file,
+            e.g. `sys.stdin.buffer`.  Chunked files can't be read from a pipe.
+        """
+        fh = open(self.filename, 'rb') if source is None else source
+        try:
+            header = self._read_header_from(fh, key=key)
+            if header.chunk_size:
+                try:
+                    mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+                except (AttributeError, EnvironmentError, ValueError):
+                    raise ValueError("Chunked files can only be streamed from a regular file")
+
+                try:
+                    for (index, chunk) in enumerate(self._read_chunk_table(mapped, header)):
+                        yield self._decode_chunk(mapped, header, chunk, index)
+                finally:
+                    mapped.close()
+                return
+
+            decode = _get_decoder(header.encoder)
+            decompressor = _decompressor(header.compression) if header.compression else None
+            remaining = None if header.length == _UNKNOWN_LENGTH else header.length
+            position = 0
+            while remaining is None or remaining > 0:
+                data = fh.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not data:
+                    break
+
+                result = decode(_chunk_key(header.encoder, header.key, position), self.__mask(data, header.var4))
+                position += len(data)
+                remaining = None if remaining is None else remaining - len(data)
+                if decompressor:
+                    result = result if _is_buffer(result) else bytes(bytearray(result))
+                    for piece in _decompress_pieces(decompressor, result, chunk_size):
+                        if piece:
+                            yield piece
+                elif len(result):
+                    yield result
+
+            if hasattr(decompressor, "flush"):
+                result = decompressor.flush()
+                if result:
+                    yield result
+        finally:
+            if source is None:
+                fh.close()
+
+    def read_chunk(self, index, key=None):
+        """Read, verify and decode the chunk `index` of a chunked file.
+
+        :param int index: The index of the chunk in `chunk_table()`
+        :param int key: The key used during `write()` (see `read()`)
+        """
+        with open(self.filename, 'rb') as fh:
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            header = self._read_header(mapped, key=key)
+            if not header.chunk_size:
+                raise ValueError("%s is not a chunked file" % self.filename)
+            return self._decode_chunk(mapped, header, self._read_chunk_table(mapped, header)[index], index)
+        finally:
+            mapped.close()
+
+    def verify(self):
+        """Check the checksum of each chunk of a chunked file, without decoding
+        them (so no key is needed).
+
+        :returns: The list of the indexes of the corrupt chunks
+        """
+        with open(self.filename, 'rb') as fh:
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            header = self._read_header(mapped)
+            if not (header.chunk_size and header.checksum):
+                raise ValueError("%s is not a chunked file with checksums" % self.filename)
+
+            bad = []
+            for (index, chunk) in enumerate(self._read_chunk_table(mapped, header)):
+                start = header.size + chunk.offset
+                if (zlib.crc32(mapped[start:start + chunk.length]) & 0xFFFFFFFF) != chunk.crc:
+                    bad.append(index)
+            return bad
+        finally:
+            mapped.close()
+
+    def write(self, data, key=None, minimum_length=32, encoder=0, byte_source=None, compression=None, chunked=None,
+              checksum=True):
         """Write the data to a file.
 
-        :param iterable data: The data you want to encode; the length of data must
-            be less than 0xFF (header size limitation)
+        :param iterable data: The data you want to encode.  Data longer than 0xFF
+            bytes is written with a version 2 header (64-bit length).
         :param int key: The key used during encoding
         :param int minimum_length: The minimum number of bytes to write.  If the
             encoding operation produces fewer bytes that this, random bytes are
             appended to the end of the result so len(bytes) == minimum_length.
+        :param int encoder: The `FUNC_MAP` id of the encoder to use; it's stored
+            in the file, so `read()` doesn't need to know it.
+        :param byte_source: The source of the padding and header noise;
+            overrides the one given to the constructor.
+        :param str compression: Compress the data with this algorithm (`"zlib"`,
+            `"bz2"` or `"lzma"`) before encoding it.  It's stored in the file,
+            so `read()` doesn't need to know it.
+        :param int chunked: Split the data into chunks of this many bytes, each
+            encoded (and compressed) on its own, followed by a chunk table.
+            Chunks can be read (`read_chunk()`), verified (`verify()`) and
+            decoded in parallel (`read(workers=N)`) independently.
+        :param bool checksum: Store a CRC-32 of each chunk in the chunk table
+        """
+        if chunked:
+            return self.write_stream([data], key, minimum_length, encoder=encoder, byte_source=byte_source,
+                                     compression=compression, chunked=chunked, checksum=checksum)
+
+        timer = instrument.Timer() if instrument.ENABLED else None
+        _key, header, bytes = self._encode_record(
+            data, key, minimum_length, encoder, byte_source, timer, compression)
+        with open(self.filename, 'wb') as fh:
+            fh.write(header)
+            fh.write(bytes)
+
+        self._invalidate()
+        if timer:
+            timer.mark("write")
+            instrument.record("write", _resolve_encoder(encoder), len(data), len(header) + len(bytes), timer,
+                              max(0, len(bytes) - len(data)))
+        return _key
+
+    def write_text(self, text, key=None, minimum_length=32, encoder=0, encoding="utf-8", **kwargs):
+        """Write the `str` text to the file.  The text is encoded to bytes in a
+        single call, instead of going through `map(ord, text)`.
+
+        :param str text: The text you want to write
+        :param str encoding: The encoding used to convert the text to bytes
+        :param kwargs: See `write()` for the other parameters
         """
-        if len(data) > 0xFF:
-            raise ValueError("Cannot encode more than 0xFF bytes")
+        return self.write(text.encode(encoding), key, minimum_length, encoder, **kwargs)
+
+    def _invalidate(self):
+        """Drop the cached contents of the file, if any."""
+        if self.cache is not None:
+            self.cache.invalidate(self.filename)
 
-        from . import obfuscate
-        _key, bytes = obfuscate(data, key=key, minimum_length=minimum_length - self.size)
+    def _encode_record(self, data, key=None, minimum_length=32, encoder=0, byte_source=None, timer=None,
+                       compression=None):
+        """Encode `data` as a record (see `write()` for the parameters).
+
+        :returns: `(key, header, masked payload and padding)`
+        """
+        byte_source = byte_source or self.byte_source
+        _key, _ = _get_encoder(encoder)(b"", key, 0)
+        if compression:
+            data = b"".join(_compress_chunks([data], compression))
 
         # Don't store the key in the file if the user passes it in
         # (they'll need to remember it).
-        _write_key = _key if key is None else random.randint(1, 255)
+        numbers, fields = self._make_header(
+            _key if key is None else None, len(data), encoder, byte_source=byte_source, compression=compression)
+        header = self._pack_header(numbers, len(data), fields)
+        if timer:
+            timer.mark("header")
 
-        numbers = self._encode_to_numbers(_write_key, data)
+        _, bytes = _get_encoder(encoder)(data, _key, minimum_length - len(header), byte_source=byte_source)
         _, _, _, var4 = self.__decode(numbers)
-        bytes = [x ^ self.__CONST_NUMS[var4] for x in bytes]
+        bytes = self.__mask(bytes if _is_buffer(bytes) else bytearray(bytes), var4)
+        if timer:
+            timer.mark("encode")
+        return (_key, header, bytes)
+
+    def write_stream(self, source, key=None, minimum_length=32, chunk_size=CHUNK_SIZE, encoder=0, byte_source=None,
+                     compression=None, chunked=None, checksum=True, output=None):
+        """Write the data from a file-like object or an iterable of chunks to a
+        file, without holding all of it in memory.
+
+        The source is read in `chunk_size` blocks; each block is encoded and
+        written immediately.  A version 2 header is always used, and its length
+        is filled in once the end of the source is reached.
+
+        :param source: A binary file-like object (anything with `read()`), or an
+            iterable of bytes-like chunks
+        :param int key: The key used during encoding (see `write()`)
+        :param int minimum_length: The minimum number of bytes to write.  If the
+            source is shorter than this, random bytes are appended.
+        :param int chunk_size: The number of bytes read from `source` at a time
+        :param int encoder: The `FUNC_MAP` id of the encoder to use
+        :param byte_source: The source of the padding (see `write()`)
+        :param str compression: The compression algorithm (see `write()`); the
+            chunks are compressed as they are read.
+        :param int chunked: Use the chunked layout, with chunks of this many
+            bytes (see `write()`)
+        :param bool checksum: Store a CRC-32 of each chunk (see `write()`)
+        :param output: A binary file object to write to instead of the file,
+            e.g. `sys.stdout.buffer`.  If it isn't seekable (a pipe), the
+            payload length can't be filled in: it's left unknown, so the
+            payload runs to the end of the output, and no padding is added.
+        """
+        from . import obfuscate_stream
+        if hasattr(source, "read"):
+            source = _read_chunks(source, chunk_size)
+        if chunked:
+            if output is not None:
+                raise ValueError("The chunked layout can only be written to the file")
+            return self._write_chunked(
+                source, key, minimum_length, chunked, encoder, byte_source, compression, checksum)
+        if compression:
+            source = _compress_chunks(source, compression)
+
+        length = [0]
+
+        def counted(chunks):
+            for chunk in chunks:
+                if not _is_buffer(chunk):
+                    chunk = bytearray(chunk)
+                length[0] += len(chunk)
+                yield chunk
+
+        byte_source = byte_source or self.byte_source
+        _key, _ = _get_encoder(encoder)(b"", key, 0)
+
+        # Don't store the key in the file if the user passes it in
+        # (they'll need to remember it).
+        numbers, fields = self._make_header(
+            _key if key is None else None, 0, encoder, version=2, byte_source=byte_source, compression=compression)
+
+        fh = open(self.filename, 'wb') if output is None else output
+        try:
+            seekable = _seekable(fh)
+            start = fh.tell() if seekable else 0
+            header = self._pack_header(numbers, 0 if seekable else _UNKNOWN_LENGTH, fields)
+            minimum_length = minimum_length - len(header) if seekable else 0
+
+            _, chunks = obfuscate_stream(
+                counted(source), key=_key, minimum_length=minimum_length, encoder=encoder, byte_source=byte_source)
+            _, _, _, var4 = self.__decode(numbers)
+            fh.write(header)
+            for chunk in chunks:
+                fh.write(self.__mask(chunk if _is_buffer(chunk) else bytearray(chunk), var4))
+
+            if seekable:
+                end = fh.tell()
+                fh.seek(start)
+                fh.write(self._pack_header(numbers, length[0], fields))
+                fh.seek(end)
+        finally:
+            if output is None:
+                fh.close()
+
+        if output is None:
+            self._invalidate()
+        return _key
+
+    def _write_chunked(self, source, key, minimum_length, chunked, encoder, byte_source, compression, checksum):
+        """Write the iterable of bytes-like `source` with the chunked layout:
+        the header, the stored chunks, the chunk table, then the padding.  The
+        header's payload length covers the stored chunks only.
+        """
+        byte_source = byte_source or self.byte_source
+        encode = _get_encoder(encoder)
+        _key, _ = encode(b"", key, 0)
+
+        numbers, fields = self._make_header(
+            _key if key is None else None, 0, encoder, version=2, byte_source=byte_source, compression=compression,
+            chunks=(chunked, checksum))
+        header = self._pack_header(numbers, 0, fields)
+        _, _, _, var4 = self.__decode(numbers)
+
+        table = []
+        offset = 0
         with open(self.filename, 'wb') as fh:
-            fh.write(self._pack_header(numbers))
-            fh.write(struct.pack('%iB' % len(bytes), *bytes))
+            fh.write(header)
+            for chunk in _rechunk(source, chunked):
+                data = b"".join(_compress_chunks([chunk], compression)) if compression else chunk
+                _, data = encode(data, _key, 0)
+                data = self.__mask(data if _is_buffer(data) else bytearray(data), var4)
+                fh.write(data)
+                table.append(ChunkInfo(offset, len(data), len(chunk), zlib.crc32(data) & 0xFFFFFFFF if checksum else 0))
+                offset += len(data)
 
+            entries = b"".join(_CHUNK_ENTRY.pack(*x) for x in table)
+            fh.write(self.__mask(_CHUNK_COUNT.pack(len(table)) + entries, var4))
+            fh.write(_random_bytes(minimum_length - fh.tell(), byte_source))
+            fh.seek(0)
+            fh.write(self._pack_header(numbers, offset, fields))
+
+        self._invalidate()
         return _key
 
 
+def probe(path):
+    """Return the metadata of the obfuscated file at `path` (see
+    `ObfuscatedFile.stat`).
+
+    :param str path: The path of the file
+    """
+    return ObfuscatedFile(path).stat()
+
+
+def _parse_key(text):
+    """Convert a command-line key to an int (`90`, `0x5A`), or to bytes when it
+    isn't a number (`"deadbeef"`, for the multi-byte XOR encoder).
+    """
+    if text is None:
+        return None
+    try:
+        return int(text, 0)
+    except ValueError:
+        return bytes(bytearray.fromhex(text))
+
+
+def _stream_main(args):
+    """Run the `encode` / `decode` subcommands; `args` excludes the program."""
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m obfuscator.file")
+    commands = parser.add_subparsers(dest="command")
+    for name in ("encode", "decode"):
+        command = commands.add_parser(name, help="%s data in chunks, e.g. in a pipeline" % name.capitalize())
+        command.add_argument("input", nargs="?", default="-", help="Input path (default: stdin)")
+        command.add_argument("-o", "--output", default="-", help="Output path (default: stdout)")
+        command.add_argument("-k", "--key", help="The key (90, 0x5A, or hex bytes for encoder 4); "
+                                                 "when encoding without a key, a random one is stored in the output")
+        command.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Bytes read at a time")
+
+    encode = commands.choices["encode"]
+    encode.add_argument("-e", "--encoder", type=int, default=0, help="The FUNC_MAP id of the encoder")
+    encode.add_argument("-p", "--padding", type=int, default=0,
+                        help="Minimum output size; ignored when writing to a pipe")
+    encode.add_argument("-c", "--compression", choices=sorted(COMPRESSION), help="Compress before encoding")
+    encode.add_argument("--chunked", type=int, help="Use the chunked layout with chunks of this many bytes "
+                                                    "(requires an output path)")
+    args = parser.parse_args(args)
+
+    from . import FUNC_MAP
+    try:
+        key = _parse_key(args.key)
+    except ValueError:
+        parser.error("invalid key %r: expected a number (90, 0x5A) or hex bytes" % args.key)
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be positive")
+    if args.command == "encode":
+        encoders = sorted(x for x in FUNC_MAP if isinstance(x, int))
+        if args.encoder not in encoders:
+            parser.error("unknown encoder %i (choose from %s)" % (args.encoder, ", ".join(map(str, encoders))))
+        if args.chunked is not None and args.chunked < 1:
+            parser.error("--chunked must be positive")
+        if args.chunked and args.output == "-":
+            parser.error("--chunked requires an output path (-o)")
+
+    stdin = getattr(sys.stdin, "buffer", sys.stdin)
+    stdout = getattr(sys.stdout, "buffer", sys.stdout)
+    try:
+        source = stdin if args.input == "-" else open(args.input, 'rb')
+    except EnvironmentError as error:
+        parser.error("cannot open %s: %s" % (args.input, error.strerror))
+
+    try:
+        if args.command == "encode":
+            ofile = ObfuscatedFile(args.output)
+            ofile.write_stream(
+                source, key, args.padding, args.chunk_size, args.encoder, compression=args.compression,
+                chunked=args.chunked, output=stdout if args.output == "-" else None)
+        else:
+            output = stdout if args.output == "-" else open(args.output, 'wb')
+            try:
+                for piece in ObfuscatedFile(args.input).read_stream(key, args.chunk_size, source=source):
+                    output.write(piece if _is_buffer(piece) else bytearray(piece))
+            finally:
+                if output is stdout:
+                    output.flush()
+                else:
+                    output.close()
+    except (EnvironmentError, ValueError) as error:
+        # e.g. an unwritable output, or an input that isn't an obfuscated file
+        parser.exit(1, "%s: error: %s\n" % (parser.prog, error))
+    finally:
+        if source is not stdin:
+            source.close()
+
+    return 0
+
+
 def main(args=sys.argv):
-    if "decode-str" in args:
+    if args[1:2] in (["encode"], ["decode"]):
+        return _stream_main(args[1:])
+    elif "decode-str" in args:
         path, key = args[2:4]
         ofile = ObfuscatedFile(path)
-        bytes = ofile.read(int(key))
-        print("".join([chr(x) for x in bytes]))
+        print(ofile.read_text(int(key)))
     elif "encode-str" in args:
         path, key, string = args[2:5]
         ofile = ObfuscatedFile(path)
-        bytes = map(ord, string)
-        print(bytes)
-        ofile.write(bytes, int(key))
+        print(list(bytearray(string.encode("utf-8"))))
+        ofile.write_text(string, int(key))
     else:
         print("Usage:")
+        print("\tpython -m obfuscator.file encode [<input>] [-o <output>] [-k <key>] [-e <encoder>] [-p <padding>]")
+        print("\tpython -m obfuscator.file decode [<input>] [-o <output>] [-k <key>]")
         print("\tpython -m obfuscator.file encode-str <path-to-file> <key> \"string to encode\"")
         print("\tpython -m obfuscator.file decode-str <path-to-file> <key>")
+        print("")
+        print("encode/decode read stdin and write stdout by default, so they can be used in pipelines:")
+        print("\tpg_dump | python -m obfuscator.file encode > dump.bin")
+        print("\tpython -m obfuscator.file decode dump.bin | psql")
 
 
 if __name__ == '__main__':
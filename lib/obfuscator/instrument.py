@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+This module contains the runtime instrumentation of the library.
+
+Instrumentation is off by default, and then costs one flag check per call.
+Once enabled, every call to `obfuscate()`, `deobfuscate()`,
+`ObfuscatedFile.read()` (and `read_range()`) and `ObfuscatedFile.write()` is
+timed and passed to the hooks.  The counters are kept per
+`(encoder, direction)`: the direction is `"encode"` for `obfuscate()` and
+`write()`, and `"decode"` for `deobfuscate()` and `read()`, so the totals of an
+encoder don't depend on the entry point; the events say which it was::
+
+    >>> import obfuscator
+    >>> from obfuscator import instrument
+    >>> instrument.enable()
+    >>> instrument.add_hook(lambda event: print(event.operation, event.stages))
+    >>> key, data = obfuscator.obfuscate(b"testing")
+    obfuscate OrderedDict()
+    >>> obfuscator.stats()
+    {(1, 'encode'): Stats(calls=1, bytes_in=7, bytes_out=32, padding=25, seconds=1.9e-05)}
+
+The file operations also report the time spent in each stage: `open`,
+`header` and `decode` for reads; `header`, `encode` and `write` for writes.
+Each call is counted once: the encoding done by a file operation isn't also
+counted as an `obfuscate()` call.  The batch, streaming and in-place functions
+(`obfuscate_many()`, `obfuscate_stream()`, `obfuscate_into()`, their inverses
+and `ObfuscatedFile.write_stream()`) aren't counted.
+"""
+__author__ = "Timothy McFadden"
+__date__ = "10/18/2026"
+__copyright__ = "Timothy McFadden, 2014"
+__license__ = "GPLv2"
+__version__ = "1.0.0"
+# Imports ######################################################################
+import time
+import threading
+import collections
+
+# Globals ######################################################################
+ENABLED = False
+Stats = collections.namedtuple("Stats", ["calls", "bytes_in", "bytes_out", "padding", "seconds"])
+Event = collections.namedtuple(
+    "Event", ["operation", "encoder", "bytes_in", "bytes_out", "padding", "seconds", "stages"])
+
+_clock = getattr(time, "perf_counter", time.time)
+_hooks = []
+_stats = {}  # (encoder, direction): [calls, bytes_in, bytes_out, padding, seconds]
+_DIRECTIONS = {"obfuscate": "encode", "write": "encode", "deobfuscate": "decode", "read": "decode"}
+_lock = threading.Lock()
+
+
+class Timer(object):
+    """Measures an operation, and the time spent in each of its stages."""
+    def __init__(self):
+        self.start = self.last = _clock()
+        self.stages = collections.OrderedDict()
+
+    def mark(self, stage):
+        """End `stage`; it started when the previous stage ended."""
+        now = _clock()
+        self.stages[stage] = now - self.last
+        self.last = now
+
+
+def enable():
+    """Start counting, and calling the hooks."""
+    global ENABLED
+    ENABLED = True
+
+
+def disable():
+    """Stop counting, and calling the hooks.  The counters are kept."""
+    global ENABLED
+    ENABLED = False
+
+
+def add_hook(hook):
+    """Call `hook(event)` with an `Event` after each instrumented operation."""
+    _hooks.append(hook)
+
+
+def remove_hook(hook):
+    _hooks.remove(hook)
+
+
+def record(operation, encoder, bytes_in, bytes_out, timer, padding=0):
+    """Count an operation that started when `timer` was created, and call the
+    hooks.
+
+    :param str operation: `"obfuscate"`, `"deobfuscate"`, `"write"` or `"read"`
+    :param int encoder: The `FUNC_MAP` id of the encoder, with the default
+        encoder (0) already resolved
+    """
+    seconds = _clock() - timer.start
+    with _lock:
+        counters = _stats.setdefault((encoder, _DIRECTIONS[operation]), [0, 0, 0, 0, 0.0])
+        counters[0] += 1
+        counters[1] += bytes_in
+        counters[2] += bytes_out
+        counters[3] += padding
+        counters[4] += seconds
+
+    if _hooks:
+        event = Event(operation, encoder, bytes_in, bytes_out, padding, seconds, timer.stages)
+        for hook in list(_hooks):
+            hook(event)
+
+
+def stats():
+    """Return the counters as a dict of `{(encoder, direction): Stats}`."""
+    with _lock:
+        return dict((name, Stats(*counters)) for (name, counters) in _stats.items())
+
+
+def reset():
+    """Clear the counters."""
+    with _lock:
+        _stats.clear()
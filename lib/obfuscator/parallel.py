@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+"""
+This module spreads the encoding of large buffers across several processes.
+
+The data is copied once into a `multiprocessing.shared_memory` block; each
+worker process attaches to the block and encodes its own slice in place, so
+the data itself is never pickled.  Every encoder that produces bytes works on
+each byte independently (the multi-byte XOR key is rotated for each slice), so
+the slices can be encoded in any order.
+
+Starting the worker processes and creating the block are the expensive parts
+of a call, so both are kept for the next call, within limits: a block larger
+than `KEEP_SIZE` is freed (in the workers too) as soon as the call returns,
+and the pool is stopped, and the block freed, once no call has been made for
+`IDLE_TIMEOUT` seconds.  `shutdown()` frees both at once.
+
+You normally don't use this module directly; pass `workers=N` to
+`obfuscate()`, `deobfuscate()` or `ObfuscatedFile.read()` instead.
+"""
+__author__ = "Timothy McFadden"
+__date__ = "10/18/2026"
+__copyright__ = "Timothy McFadden, 2014"
+__license__ = "GPLv2"
+__version__ = "1.0.0"
+# Imports ######################################################################
+import atexit
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+from . import _byte_view, _chunk_key, _transform_into, _translate_into
+
+# Globals ######################################################################
+# Smaller buffers are faster to encode in-process.  Measured with the pool
+# running: a call costs ~0.4 ms, plus ~1.1 ms/MiB to copy the data into and
+# out of shared memory.  In-process, the multi-byte XOR runs at ~5 ms/MiB, so
+# it gains from 2 workers at ~1 MiB.  The table encoders run at ~1.4 ms/MiB,
+# barely more than the copies, so they only gain with 8+ workers from
+# ~3 MiB; `TABLE_THRESHOLD` keeps them in-process below 16 MiB.
+THRESHOLD = 1024 * 1024
+TABLE_THRESHOLD = 16 * 1024 * 1024
+KEEP_SIZE = 16 * 1024 * 1024  # Largest shared memory block kept between calls
+IDLE_TIMEOUT = 30.0  # Seconds without a call before the pool is stopped (None: never)
+
+_pool = None  # The shared ProcessPoolExecutor (see `_get_pool`)
+_pool_workers = 0
+_block = None  # The shared memory block, reused while it is large enough
+_lock = threading.Lock()
+_idle_timer = None  # Stops the pool after `IDLE_TIMEOUT` (see `_schedule_idle`)
+_calls = 0
+_attached = {}  # name: SharedMemory, in the worker processes
+
+
+def _get_pool(workers):
+    """Return the shared process pool, starting it on first use.  The pool is
+    restarted when more than its number of processes are needed.
+    """
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers < workers:
+        _stop_pool()
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+    return _pool
+
+
+def _get_block(size):
+    """Return the shared memory block, replacing it if it's smaller than `size`
+    bytes.  Reusing the block avoids faulting in fresh pages on every call.
+    """
+    global _block
+    if _block is None or _block.size < size:
+        _release_block()
+        _block = shared_memory.SharedMemory(create=True, size=size)
+    return _block
+
+
+def _release_block():
+    global _block
+    if _block is not None:
+        _block.close()
+        _block.unlink()
+        _block = None
+
+
+def _stop_pool():
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown()
+    _pool, _pool_workers = None, 0
+
+
+def _schedule_idle():
+    """(Re)start the timer that stops the pool once it's been idle for
+    `IDLE_TIMEOUT` seconds.  Called with `_lock` held.
+    """
+    global _idle_timer, _calls
+    _calls += 1
+    if _idle_timer is not None:
+        _idle_timer.cancel()
+        _idle_timer = None
+    if IDLE_TIMEOUT is not None:
+        _idle_timer = threading.Timer(IDLE_TIMEOUT, _stop_idle, (_calls,))
+        _idle_timer.daemon = True
+        _idle_timer.start()
+
+
+def _stop_idle(calls):
+    """Stop the pool and free the block, unless a call was made after the timer
+    was started."""
+    with _lock:
+        if calls == _calls:
+            _stop_pool()
+            _release_block()
+
+
+def shutdown():
+    """Stop the worker processes and free the shared memory.  Both are created
+    again when needed.
+    """
+    global _idle_timer
+    with _lock:
+        if _idle_timer is not None:
+            _idle_timer.cancel()
+            _idle_timer = None
+        _stop_pool()
+        _release_block()
+
+
+atexit.register(shutdown)
+
+
+def _attach(name):
+    """Return the shared memory block `name`.  This runs in the worker
+    processes, which keep the block attached between calls.
+    """
+    block = _attached.get(name)
+    if block is None:
+        for other in _attached.values():
+            other.close()
+        _attached.clear()
+        block = _attached[name] = shared_memory.SharedMemory(name=name)
+    return block
+
+
+def _call(work, name, keep, start, end, args):
+    """Call `work(view, start, *args)` on `[start:end]` of the shared memory
+    block `name`.  This runs in the worker processes; the block is detached
+    afterwards unless `keep` is True.
+    """
+    view = _attach(name).buf[start:end]
+    try:
+        work(view, start, *args)
+    finally:
+        view.release()
+        if not keep:
+            _attached.pop(name).close()
+
+
+def _work(view, start, encoder, key, decode):
+    """Encode (or decode) the slice `view`, which starts `start` bytes into the
+    data, in place.
+    """
+    _transform_into(view, view, encoder, _chunk_key(encoder, key, start), decode)
+
+
+def _translate_work(view, start, table):
+    """Translate the slice `view` in place."""
+    _translate_into(view, view, table)
+
+
+def _run(data, workers, work, *args):
+    """Copy `data` into the shared memory block, call
+    `work(view, start, *args)` for `workers` slices of it, and return the
+    result as `bytes`.
+    """
+    source = _byte_view(data)
+    length = len(source)
+    if not length:
+        return b""
+
+    step = -(-length // workers)
+    starts = list(range(0, length, step))
+    ends = [min(start + step, length) for start in starts]
+    count = len(starts)
+
+    keep = length <= KEEP_SIZE
+    with _lock:
+        block = _get_block(length)
+        try:
+            block.buf[:length] = source
+            list(_get_pool(workers).map(
+                _call, [work] * count, [block.name] * count, [keep] * count, starts, ends, [args] * count))
+            return bytes(block.buf[:length])
+        except BrokenProcessPool:
+            _stop_pool()
+            raise
+        finally:
+            if not keep:
+                _release_block()
+            _schedule_idle()
+
+
+def transform(data, key, encoder, workers, decode=False):
+    """Encode (or decode) the bytes-like `data` with `workers` processes.
+
+    The process pool and the shared memory are kept between calls, within the
+    limits described in the module docstring, and calls are serialized.
+
+    :param data: The data you want to encode/decode
+    :param key: The key used during encoding
+    :param int encoder: The `FUNC_MAP` id of the encoder; it must produce bytes
+    :param int workers: The number of worker processes
+    :param bool decode: Decode instead of encode
+    :returns: The encoded/decoded data as `bytes`
+    """
+    return _run(data, workers, _work, encoder, key, decode)
+
+
+def translate(data, table, workers):
+    """Translate the bytes-like `data` with `table` (see `bytes.translate`)
+    using `workers` processes, like `transform`.
+
+    :param data: The data you want to translate
+    :param bytes table: A 256-byte translation table
+    :param int workers: The number of worker processes
+    :returns: The translated data as `bytes`
+    """
+    return _run(data, workers, _translate_work, table)
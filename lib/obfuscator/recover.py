@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+"""
+This module recovers lost keys.
+
+When `ObfuscatedFile.write()` is given a key, the key isn't stored in the file.
+For the single-byte encoders (XOR, offset and ROT13) there are only 255
+possible keys, so `recover_key` tries all of them against a sample of the
+payload and returns the candidates that pass a test, best first::
+
+    >>> from obfuscator.recover import recover_key
+    >>> recover_key("data.bin", known_plaintext=b"BEGIN")
+    [Candidate(encoder=1, key=123, score=1.0, preview=b'BEGIN ...')]
+
+The payload is never decoded 255 times: a known plaintext is encoded with each
+key and searched for, a charset is scored from a histogram of the sample, and
+a predicate is first run on a short prefix so most keys are rejected early.
+
+From the command line::
+
+    python -m obfuscator.recover data.bin --known BEGIN
+    python -m obfuscator.recover data.bin --charset 0123456789,.
+"""
+__author__ = "Timothy McFadden"
+__date__ = "10/18/2026"
+__copyright__ = "Timothy McFadden, 2014"
+__license__ = "GPLv2"
+__version__ = "1.0.0"
+# Imports ######################################################################
+import sys
+import zlib
+import string
+import argparse
+import operator
+import collections
+
+from . import DEFAULT_ENCODER, _get_table, _get_byte_table, _is_buffer
+from .file import ObfuscatedFile, _decompressor
+
+try:
+    import lzma
+except ImportError:  # pragma: no cover
+    lzma = None
+
+# Globals ######################################################################
+SAMPLE_SIZE = 64 * 1024  # Bytes of the payload examined
+PREFIX_SIZE = 64  # Bytes a predicate sees before it sees the whole sample
+THRESHOLD = 0.9  # Minimum fraction of the sample that must be in the charset
+PRINTABLE = string.printable.encode("ascii")
+ENCODERS = (1, 5, 3)  # Tried on raw data; files record their encoder
+_LETTERS = (string.ascii_letters + " ").encode("ascii")  # Break ties between charset scores
+
+# A candidate key, with its score (higher is better) and the start of the
+# plaintext it produces
+Candidate = collections.namedtuple("Candidate", ["encoder", "key", "score", "preview"])
+
+_PREVIEW_SIZE = 32
+_IDENTITY = bytes(bytearray(range(256)))
+
+# How a compressed payload starts, so wrong keys are rejected before
+# decompressing anything
+_MAGIC = {"zlib": b"\x78", "bz2": b"BZh", "lzma": b"\xfd7zXZ\x00"}
+_DECOMPRESS_ERRORS = (zlib.error, IOError, EOFError) + ((lzma.LZMAError,) if lzma else ())
+
+
+def _tables(encoder, key):
+    """Return the `(decode, encode)` translation tables of `encoder` with
+    `key`.  The unwrapped offset encoder is handled modulo 256.
+    """
+    if encoder == 2:
+        return (_get_table(operator.sub, key), _get_table(operator.add, key))
+    return (_get_byte_table(encoder, key, decode=True), _get_byte_table(encoder, key))
+
+
+def _candidates(encoders):
+    """Return `[(encoder, key, decode table, encode table)]` for every key of
+    every encoder.
+    """
+    result = []
+    for encoder in encoders:
+        encoder = DEFAULT_ENCODER if encoder == 0 else encoder
+        if encoder not in (1, 2, 3, 5):
+            raise ValueError("Keys can only be recovered for the single-byte encoders, not %r" % encoder)
+
+        for key in ([None] if encoder == 3 else range(1, 256)):
+            result.append((encoder, key) + _tables(encoder, key))
+    return result
+
+
+def _as_bytes(value):
+    return value.encode("utf-8") if not _is_buffer(value) else bytes(value)
+
+
+def _load(data, sample_size):
+    """Return `(sample, compression, encoder)` for a path or raw data; the
+    encoder is only known for files.
+    """
+    if isinstance(data, str):
+        header, sample = ObfuscatedFile(data)._read_sample(sample_size)
+        return (bytes(sample), header.compression, header.encoder)
+
+    sample = data[:sample_size]
+    if not _is_buffer(sample):
+        # The unwrapped offset encoder produces ints > 0xFF
+        sample = bytearray(x & 0xFF for x in sample)
+    return (bytes(sample), None, None)
+
+
+def _score(sample, candidates, predicate, known_plaintext, charset, threshold, prefix_size):
+    """Test each candidate against `sample`, and return `(Candidate, tie-break)`
+    for those that pass.
+
+    A charset is scored from the histogram of the sample, so the cost per key
+    doesn't depend on the sample size.  Many keys map text to other printable
+    bytes, so equal charset scores are ranked by how much of the plaintext is
+    letters and spaces.
+    """
+    result = []
+    if charset is not None:
+        (allowed, letters) = (bytearray(256), bytearray(256))
+        for value in bytearray(charset):
+            allowed[value] = 1
+        for value in bytearray(_LETTERS):
+            letters[value] = 1
+
+        counts = collections.Counter(bytearray(sample)).items()
+        total = float(len(sample)) or 1.0
+        for (encoder, key, decode, _) in candidates:
+            table = bytearray(decode)
+            score = sum(count for (value, count) in counts if allowed[table[value]]) / total
+            if score >= threshold:
+                text = sum(count for (value, count) in counts if letters[table[value]]) / total
+                result.append((Candidate(encoder, key, score, sample[:_PREVIEW_SIZE].translate(decode)), text))
+    elif known_plaintext is not None:
+        for (encoder, key, decode, encode) in candidates:
+            count = sample.count(known_plaintext.translate(encode))
+            if count:
+                result.append((Candidate(encoder, key, float(count), sample[:_PREVIEW_SIZE].translate(decode)), 0))
+    else:
+        prefix = sample[:prefix_size]
+        for (encoder, key, decode, _) in candidates:
+            if len(prefix) < len(sample) and not predicate(prefix.translate(decode)):
+                continue
+            score = predicate(sample.translate(decode))
+            if score:
+                result.append((Candidate(encoder, key, float(score), sample[:_PREVIEW_SIZE].translate(decode)), 0))
+    return result
+
+
+def recover_key(data, predicate=None, known_plaintext=None, charset=None, encoders=None, sample_size=SAMPLE_SIZE,
+                threshold=THRESHOLD, prefix_size=PREFIX_SIZE):
+    """Try every key of the single-byte encoders against `data`, and return the
+    candidates that pass the test, best first.
+
+    Only one test can be given; by default, `charset` is printable ASCII.  Only
+    the first `sample_size` bytes of the payload (of the first chunk, for a
+    chunked file) are examined.  A compressed payload is only decompressed for
+    the keys that produce the compression header.
+
+    :param data: The path of a file written by `ObfuscatedFile`, or encoded
+        data (e.g. from `obfuscate()`); padding lowers the charset score, so
+        strip it if you can.
+    :param predicate: A function called with a decoded piece of the sample,
+        that returns False to reject the key, or a score.  It's called on the
+        first `prefix_size` bytes first, so it must accept a truncated
+        plaintext.
+    :param known_plaintext: Bytes (or `str`, encoded as UTF-8) that appear
+        somewhere in the sample; the score is the number of matches.
+    :param charset: The bytes (or `str`, encoded as UTF-8) the plaintext is made
+        of; the score is the fraction of the sample in the charset.
+    :param encoders: The `FUNC_MAP` ids to try: 1 (XOR), 2 (offset), 3 (ROT13)
+        and/or 5 (modulo-256 offset).  By default, the encoder stored in the
+        file, or 1, 5 and 3 for raw data.
+    :param int sample_size: The number of payload bytes to examine
+    :param float threshold: The minimum charset score of a candidate
+    :param int prefix_size: The number of bytes the predicate sees first
+    :returns: A list of `Candidate(encoder, key, score, preview)`; the key of
+        ROT13 is None.
+    """
+    if sum(x is not None for x in (predicate, known_plaintext, charset)) > 1:
+        raise ValueError("Only one of predicate, known_plaintext and charset can be given")
+    if predicate is None and known_plaintext is None:
+        charset = _as_bytes(PRINTABLE if charset is None else charset)
+    if known_plaintext is not None:
+        known_plaintext = _as_bytes(known_plaintext)
+        if not known_plaintext:
+            raise ValueError("known_plaintext must not be empty")
+
+    (sample, compression, encoder) = _load(data, sample_size)
+    candidates = _candidates(encoders or ((encoder,) if encoder is not None else ENCODERS))
+    args = (predicate, known_plaintext, charset, threshold, prefix_size)
+    if not compression:
+        result = _score(sample, candidates, *args)
+    else:
+        magic = _MAGIC.get(compression, b"")
+        result = []
+        for (encoder, key, decode, _) in candidates:
+            if not sample.startswith(magic.translate(_tables(encoder, key)[1])):
+                continue
+            try:
+                plain = _decompressor(compression).decompress(sample.translate(decode), sample_size)
+            except _DECOMPRESS_ERRORS:
+                continue
+            result.extend(_score(plain, [(encoder, key, _IDENTITY, _IDENTITY)], *args))
+
+    result.sort(key=lambda x: (-x[0].score, -x[1], x[0].encoder, x[0].key or 0))
+    return [candidate for (candidate, _) in result]
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m obfuscator.recover", description="Find the key of a file written with an explicit key")
+    parser.add_argument("input", help="The file; with --raw, encoded data ('-' for stdin)")
+    parser.add_argument("--raw", action="store_true", default=False,
+                        help="The input is encoded data, not a file written by ObfuscatedFile")
+    test = parser.add_mutually_exclusive_group()
+    test.add_argument("-k", "--known", help="Text known to be in the plaintext")
+    test.add_argument("--known-hex", help="Bytes known to be in the plaintext, in hex")
+    test.add_argument("-c", "--charset", help="The characters the plaintext is made of (default: printable ASCII)")
+    parser.add_argument("-e", "--encoder", type=int, action="append",
+                        help="Try this encoder (may be repeated; default: the file's encoder)")
+    parser.add_argument("-s", "--sample-size", type=int, default=SAMPLE_SIZE, help="Bytes of the payload to examine")
+    parser.add_argument("-t", "--threshold", type=float, default=THRESHOLD, help="Minimum charset score")
+    parser.add_argument("-n", "--limit", type=int, default=10, help="Number of candidates to show")
+    args = parser.parse_args(args)
+
+    data = args.input
+    if args.raw:
+        stdin = getattr(sys.stdin, "buffer", sys.stdin)
+        if args.input == "-":
+            data = stdin.read(args.sample_size)
+        else:
+            with open(args.input, 'rb') as fh:
+                data = fh.read(args.sample_size)
+    elif args.input == "-":
+        parser.error("reading stdin requires --raw")
+
+    known = bytes(bytearray.fromhex(args.known_hex)) if args.known_hex else args.known
+    candidates = recover_key(
+        data, known_plaintext=known, charset=args.charset, encoders=args.encoder, sample_size=args.sample_size,
+        threshold=args.threshold)
+    for candidate in candidates[:args.limit]:
+        print("encoder %i  key %4s  score %8.3f  %r" % candidate)
+
+    return 0 if candidates else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())  # pragma: no cover
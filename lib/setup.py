@@ -1,6 +1,5 @@
 #!/usr/bin/env python
 '''obfuscator package setup script.'''
-from __future__ import print_function
 import os
 import sys
 
@@ -28,7 +27,9 @@ if __name__ == '__main__':
         author="Timothy McFadden",
         url="https://github.com/mtik00/obfuscator",
         download_url="https://github.com/mtik00/obfuscator/releases/download/v{0}/obfuscator-{0}.tar.gz".format(__version__),
+        python_requires=">=3.8",
         install_requires=[],
+        extras_require={"numpy": ["numpy"]},
         packages=find_packages(),
         package_data={"obfuscator": ['.*']},
         zip_safe=True,
@@ -40,9 +41,8 @@ if __name__ == '__main__':
             'Environment :: Other Environment',
             'License :: OSI Approved :: GNU General Public License v2 (GPLv2)',
             'Programming Language :: Python',
-            'Programming Language :: Python :: 2',
-            'Programming Language :: Python :: 2.7',
             'Programming Language :: Python :: 3',
+            'Programming Language :: Python :: 3 :: Only',
             'Intended Audience :: Developers',
             'Environment :: Console',
             'Natural Language :: English',
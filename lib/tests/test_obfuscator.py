@@ -9,27 +9,22 @@ This is the unit test for obfuscator.
 """
 import os
 import sys
+import operator
 import unittest
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import obfuscator
 
-if sys.version_info.major > 2:
-    import builtins
-
-    def map(*args):
-        return list(builtins.map(*args))
-
 
 class Test(unittest.TestCase):
 
     def test_obfuscate_xor_string(self):
         data = "testing"
-        key, bytes = obfuscator.obfuscate_xor(map(ord, data), minimum_length=40)
+        key, bytes = obfuscator.obfuscate_xor(list(map(ord, data)), minimum_length=40)
         self.assertGreater(key, 0)
         self.assertEqual(len(bytes), 40)
 
-        key, bytes = obfuscator.obfuscate_xor(map(ord, data), key=0x0F, minimum_length=0)
+        key, bytes = obfuscator.obfuscate_xor(list(map(ord, data)), key=0x0F, minimum_length=0)
         self.assertEqual(key, 0x0F)
         self.assertEqual(len(bytes), len(data))
 
@@ -56,13 +51,39 @@ class Test(unittest.TestCase):
         self.assertEqual("t", chr(new_bytes[0]))
         self.assertEqual("g", chr(new_bytes[-1]))
 
+    def test_xor_buffer(self):
+        data = bytearray(b"testing")
+        key, encoded = obfuscator.obfuscate_xor(bytes(data), key=0x0F, minimum_length=0)
+        self.assertIsInstance(encoded, bytes)
+        self.assertEqual(bytes(bytearray(x ^ 0x0F for x in data)), encoded)
+        self.assertEqual(bytes(data), obfuscator.deobfuscate_xor(key, encoded))
+
+        key, encoded = obfuscator.obfuscate_xor(data, minimum_length=40)
+        self.assertIsInstance(encoded, bytearray)
+        self.assertEqual(40, len(encoded))
+        self.assertEqual(data, obfuscator.deobfuscate_xor(key, encoded)[:len(data)])
+
+        encoded = obfuscator.obfuscate_xor(b"testing", key=0x0F, minimum_length=0)[1]
+        self.assertEqual(b"testing", obfuscator.deobfuscate_xor(0x0F, memoryview(encoded)))
+
+    def test_get_table(self):
+        import operator
+        table = obfuscator._get_table(operator.xor, 0x5A)
+        self.assertEqual(256, len(table))
+        self.assertIs(table, obfuscator._get_table(operator.xor, 0x5A))
+        self.assertEqual(0x41 ^ 0x5A, bytearray(table)[0x41])
+
+    def test_xor_list_out_of_range(self):
+        # Values that do not fit in a byte fall back to the per-item operation
+        self.assertEqual([300 ^ 0x0F], obfuscator.deobfuscate_xor(0x0F, [300]))
+
     def test_obfuscate_offset_string(self):
         data = "testing"
-        key, bytes = obfuscator.obfuscate_offset(map(ord, data), minimum_length=40)
+        key, bytes = obfuscator.obfuscate_offset(list(map(ord, data)), minimum_length=40)
         self.assertGreaterEqual(key, 0)
         self.assertEqual(len(bytes), 40)
 
-        key, bytes = obfuscator.obfuscate_offset(map(ord, data), key=0x0F, minimum_length=0)
+        key, bytes = obfuscator.obfuscate_offset(list(map(ord, data)), key=0x0F, minimum_length=0)
         self.assertEqual(key, 0x0F)
         self.assertEqual(len(bytes), len(data))
 
@@ -89,6 +110,32 @@ class Test(unittest.TestCase):
         self.assertEqual("t", chr(new_bytes[0]))
         self.assertEqual("g", chr(new_bytes[-1]))
 
+    def test_offset_mod(self):
+        data = [0x01, 0x06, 0xFF]
+        key, encoded = obfuscator.obfuscate_offset_mod(data, key=0x0F, minimum_length=0)
+        self.assertEqual([0x10, 0x15, 0x0E], encoded)
+        self.assertEqual(data, obfuscator.deobfuscate_offset_mod(key, encoded))
+
+        key, encoded = obfuscator.obfuscate_offset_mod(b"testing", minimum_length=32)
+        self.assertIsInstance(encoded, bytes)
+        self.assertEqual(32, len(encoded))
+        self.assertEqual(b"testing", obfuscator.deobfuscate(key, encoded, encoder=5)[:7])
+
+        buf = bytearray(b"testing")
+        obfuscator.obfuscate_into(buf, 200, encoder=5)
+        self.assertEqual(obfuscator.obfuscate_offset_mod(b"testing", 200, 0)[1], buf)
+
+    def test_text(self):
+        text = u"testing \u00e9\u4e2d"
+        for encoder in (1, 2, 3, 4, 5):
+            key, data = obfuscator.obfuscate_text(text, encoder=encoder)
+            self.assertEqual(len(text.encode("utf-8")), len(data))
+            self.assertEqual(text, obfuscator.deobfuscate_text(key, data, encoder=encoder))
+
+        key, data = obfuscator.obfuscate_text(text, 0x33, 64, encoding="utf-16-le")
+        self.assertEqual(64, len(data))
+        self.assertEqual(text, obfuscator.deobfuscate_text(key, data, encoding="utf-16-le", length=len(text) * 2))
+
     def test_get_decoder(self):
         self.assertIs(obfuscator._get_decoder(1), obfuscator.deobfuscate_xor)
         self.assertIs(obfuscator._get_decoder(2), obfuscator.deobfuscate_offset)
@@ -114,26 +161,238 @@ class Test(unittest.TestCase):
             self.assertEqual(bytes[1], combinator(2, 10))
 
     def test_rot13_encode(self):
-        original = map(ord, "test")
-        encoded = map(ord, "grfg")
+        original = list(map(ord, "test"))
+        encoded = list(map(ord, "grfg"))
 
         self.assertEqual((None, encoded), obfuscator.rot13(original, minimum_length=0))
         self.assertEqual((None, encoded), obfuscator.obfuscate_rot13(original, minimum_length=0))
 
     def test_rot13_encode_str(self):
         original = "test"
-        encoded = map(ord, "grfg")
+        encoded = list(map(ord, "grfg"))
 
         self.assertEqual((None, encoded), obfuscator.rot13(original, minimum_length=0))
         self.assertEqual((None, encoded), obfuscator.obfuscate_rot13(original, minimum_length=0))
 
     def test_rot13_decode(self):
-        original = map(ord, "test")
-        encoded = map(ord, "grfg")
+        original = list(map(ord, "test"))
+        encoded = list(map(ord, "grfg"))
 
         self.assertEqual((None, original), obfuscator.rot13(encoded, minimum_length=0))
         self.assertEqual(original, obfuscator.deobfuscate_rot13(None, encoded))
 
+    def test_rot13_buffer(self):
+        self.assertEqual((None, b"Uryyb, jbeyq!"), obfuscator.rot13(b"Hello, world!", minimum_length=0))
+        self.assertEqual(bytearray(b"Hello"), obfuscator.deobfuscate_rot13(None, bytearray(b"Uryyb")))
+
+        _, encoded = obfuscator.obfuscate_rot13(b"test", minimum_length=10)
+        self.assertEqual(10, len(encoded))
+        self.assertEqual(b"grfg", encoded[:4])
+
+    def test_rot13_table(self):
+        table = bytearray(obfuscator._ROT13_TABLE)
+        self.assertEqual(256, len(table))
+        self.assertEqual(ord("N"), table[ord("A")])
+        self.assertEqual(ord("m"), table[ord("z")])
+        self.assertEqual(ord("5"), table[ord("5")])
+        self.assertEqual(0xE9, table[0xE9])
+
+    def test_obfuscate_stream(self):
+        chunks = [b"test", b"ing", b""]
+        for encoder in [1, 3]:
+            key, encoded = obfuscator.obfuscate_stream(iter(chunks), encoder=encoder, minimum_length=0)
+            encoded = list(encoded)
+            self.assertEqual(3, len(encoded))
+            self.assertEqual(obfuscator.obfuscate(b"testing", key, 0, encoder)[1], b"".join(encoded))
+
+            decoded = obfuscator.deobfuscate_stream(key, iter(encoded), encoder=encoder)
+            self.assertEqual(b"testing", b"".join(decoded))
+
+    def test_obfuscate_stream_padding(self):
+        key, encoded = obfuscator.obfuscate_stream([b"test", b"ing"], key=0x0F, minimum_length=32)
+        self.assertEqual(0x0F, key)
+        encoded = list(encoded)
+        self.assertEqual(3, len(encoded))
+        self.assertEqual(25, len(encoded[-1]))
+
+        key, encoded = obfuscator.obfuscate_stream([b"x" * 40], minimum_length=32)
+        self.assertGreater(key, 0)
+        self.assertEqual(1, len(list(encoded)))
+
+    def test_obfuscate_into(self):
+        import array
+        buf = bytearray(b"testing")
+        key = obfuscator.obfuscate_into(buf, key=0x0F)
+        self.assertEqual(0x0F, key)
+        self.assertEqual(obfuscator.obfuscate_xor(b"testing", 0x0F, 0)[1], bytes(buf))
+        self.assertIs(buf, obfuscator.deobfuscate_into(key, buf))
+        self.assertEqual(b"testing", buf)
+
+        buf = array.array('B', b"xxtestingxx")
+        view = memoryview(buf)[2:9]
+        obfuscator.obfuscate_into(view, encoder=3)
+        self.assertEqual(b"xxgrfgvatxx", buf.tobytes())
+
+    def test_obfuscate_into_errors(self):
+        self.assertRaises(TypeError, obfuscator.obfuscate_into, b"testing")
+        self.assertRaises(ValueError, obfuscator.obfuscate_into, bytearray(b"testing"), encoder=2)
+
+    def test_obfuscate_out(self):
+        out = bytearray(40)
+        key, result = obfuscator.obfuscate(b"testing", out=out)
+        self.assertIs(out, result)
+        self.assertEqual(obfuscator.obfuscate_xor(b"testing", key, 0)[1], bytes(out[:7]))
+
+        decoded = bytearray(40)
+        obfuscator.deobfuscate(key, out, out=decoded)
+        self.assertEqual(b"testing", decoded[:7])
+
+        self.assertRaises(ValueError, obfuscator.obfuscate, b"testing", out=bytearray(10))
+
+    @unittest.skipIf(obfuscator.numpy is None, "requires NumPy")
+    def test_numpy_xor(self):
+        import numpy
+        data = numpy.frombuffer(b"testing", dtype=numpy.uint8)
+        key, encoded = obfuscator.obfuscate_xor(data, key=0x0F, minimum_length=0)
+        self.assertIsInstance(encoded, numpy.ndarray)
+        self.assertEqual(obfuscator.obfuscate_xor(b"testing", 0x0F, 0)[1], encoded.tobytes())
+        self.assertEqual(b"testing", obfuscator.deobfuscate_xor(key, encoded).tobytes())
+
+        key, encoded = obfuscator.obfuscate_xor(data, minimum_length=40)
+        self.assertEqual(40, encoded.size)
+        self.assertEqual(numpy.uint8, encoded.dtype)
+
+    @unittest.skipIf(obfuscator.numpy is None, "requires NumPy")
+    def test_numpy_offset(self):
+        import numpy
+        data = [0x01, 0x06, 0xFF]
+        key, encoded = obfuscator.obfuscate_offset(data, key=0x0F, minimum_length=0, backend="numpy")
+        self.assertIsInstance(encoded, numpy.ndarray)
+        self.assertEqual([0x10, 0x15, 0x10E], encoded.tolist())
+        self.assertEqual(data, obfuscator.deobfuscate_offset(key, encoded).tolist())
+        self.assertEqual(data, obfuscator.deobfuscate_offset(key, encoded, backend="python"))
+
+    def test_backend(self):
+        self.assertRaises(ValueError, obfuscator.obfuscate_xor, [1, 2], backend="fortran")
+        self.assertEqual([1 ^ 7, 2 ^ 7], obfuscator.obfuscate_xor([1, 2], 7, 0, backend="python")[1])
+
+    def test_xor_multi(self):
+        data = bytes(bytearray(range(256))) * 600
+        key, encoded = obfuscator.obfuscate_xor_multi(data, minimum_length=0)
+        self.assertEqual(8, len(key))
+        expected = bytearray(x ^ bytearray(key)[i % 8] for i, x in enumerate(bytearray(data)))
+        self.assertEqual(bytes(expected), encoded)
+        self.assertEqual(data, obfuscator.deobfuscate_xor_multi(key, encoded))
+
+        key, encoded = obfuscator.obfuscate_xor_multi([1, 2, 3], key=b"ab", minimum_length=10)
+        self.assertEqual(b"ab", key)
+        self.assertEqual([1 ^ 0x61, 2 ^ 0x62, 3 ^ 0x61], encoded[:3])
+        self.assertEqual(10, len(encoded))
+
+    def test_key_schedule(self):
+        obfuscator._SCHEDULES.clear()
+        self.assertEqual(9, obfuscator._key_schedule(b"abc", 7)[0])  # Rounded up to whole keys
+        self.assertEqual(9, obfuscator._key_schedule(b"abc", 2)[0])  # The larger schedule is reused
+        self.assertEqual(obfuscator.CHUNK_SIZE + 2, obfuscator._key_schedule(b"abc", 10 ** 9)[0])
+        self.assertEqual(b"\x02\x00\x02\x02", obfuscator.obfuscate_xor_multi(b"cbac", b"abc", 0)[1])
+
+    def test_key_schedule_lru(self):
+        obfuscator._SCHEDULES.clear()
+        keys = [b"k%i" % i for i in range(obfuscator._MAX_SCHEDULES + 10)]
+        for key in keys:
+            obfuscator._key_schedule(keys[0], 4)  # Keep the first key in use
+            obfuscator._key_schedule(key, 4)
+        self.assertEqual(obfuscator._MAX_SCHEDULES, len(obfuscator._SCHEDULES))
+        self.assertIn(keys[0], obfuscator._SCHEDULES)
+        self.assertNotIn(keys[1], obfuscator._SCHEDULES)
+        self.assertIn(keys[-1], obfuscator._SCHEDULES)
+
+    def test_xor_multi_stream(self):
+        key, encoded = obfuscator.obfuscate_stream([b"tes", b"ting"], key=b"xyz", encoder=4, minimum_length=0)
+        encoded = b"".join(encoded)
+        self.assertEqual(obfuscator.obfuscate_xor_multi(b"testing", b"xyz", 0)[1], encoded)
+
+        decoded = obfuscator.deobfuscate_stream(key, [encoded[:5], encoded[5:]], encoder=4)
+        self.assertEqual(b"testing", b"".join(decoded))
+
+    def test_obfuscate_many(self):
+        records = [b"alice", bytearray(b"bob"), b"", b"carol" * 10]
+        for encoder in [1, 2, 3, 4]:
+            keys, outputs = obfuscator.obfuscate_many(records, minimum_length=0, encoder=encoder)
+            self.assertEqual(len(records), len(keys))
+            for (key, record, output) in zip(keys, records, outputs):
+                self.assertEqual(obfuscator.obfuscate(record, key, 0, encoder)[1], output)
+
+            decoded = obfuscator.deobfuscate_many(keys, outputs, encoder=encoder)
+            self.assertEqual([list(bytearray(x)) for x in records], [list(x) for x in decoded])
+
+    def test_obfuscate_many_keys(self):
+        import array
+        keys, outputs = obfuscator.obfuscate_many([b"ab", [1, 2]], key=[3, 4], minimum_length=8)
+        self.assertEqual(array.array('B', [3, 4]), keys)
+        self.assertEqual([8, 8], [len(x) for x in outputs])
+        self.assertEqual(b"ab", outputs[0][:2].translate(obfuscator._get_table(operator.xor, 3)))
+        self.assertEqual([1 ^ 4, 2 ^ 4], outputs[1][:2])
+
+        keys, outputs = obfuscator.obfuscate_many([b"ab", b"cd"], key=0x0F, minimum_length=0)
+        self.assertEqual([b"ab", b"cd"], obfuscator.deobfuscate_many(0x0F, outputs))
+        self.assertRaises(ValueError, obfuscator.obfuscate_many, [b"ab"], key=[1, 2])
+
+    def test_obfuscate_many_padding(self):
+        records = [b"ab", bytearray(b"cde"), [1, 2], b"x" * 20]
+        for encoder in [1, 3, 5]:
+            keys = [3, 4, 3, 5] if encoder != 3 else [None] * 4
+            _, outputs = obfuscator.obfuscate_many(
+                records, key=keys, minimum_length=8, encoder=encoder, byte_source=obfuscator.seeded_byte_source(1))
+            source = obfuscator.seeded_byte_source(1)
+            expected = [obfuscator.obfuscate(r, k, 8, encoder, byte_source=source)[1] for (k, r) in zip(keys, records)]
+            self.assertEqual(expected, outputs)
+            self.assertEqual([bytes, bytearray, list, bytes], [type(x) for x in outputs])
+
+    def test_obfuscate_many_random_keys(self):
+        for encoder in [0, 1, 5]:
+            keys = obfuscator._batch_keys(None, 3, encoder)
+            self.assertTrue(all(1 <= x <= 255 for x in keys))
+        self.assertEqual([None] * 3, obfuscator._batch_keys(None, 3, 3))
+
+        keys, outputs = obfuscator.obfuscate_many([b"alice", b"bob"], minimum_length=0, encoder=5)
+        self.assertEqual([b"alice", b"bob"], obfuscator.deobfuscate_many(keys, outputs, encoder=5))
+
+    def test_obfuscate_many_falsy_key(self):
+        # Like obfuscate(), a falsy key means "pick a random key"
+        records = [b"secret", b"pass"]
+        for encoder in [0, 1, 2, 5]:
+            keys, outputs = obfuscator.obfuscate_many(records, key=0, minimum_length=0, encoder=encoder)
+            self.assertTrue(all(keys))
+            self.assertNotEqual([list(bytearray(x)) for x in records], [list(x) for x in outputs])
+            decoded = obfuscator.deobfuscate_many(keys, outputs, encoder)
+            self.assertEqual([list(bytearray(x)) for x in records], [list(x) for x in decoded])
+
+        keys, outputs = obfuscator.obfuscate_many(records, key=[0, 7], minimum_length=0)
+        self.assertNotEqual(0, keys[0])
+        self.assertEqual(7, keys[1])
+        keys, outputs = obfuscator.obfuscate_many(records, key=b"", minimum_length=0, encoder=4)
+        self.assertTrue(all(keys))
+        self.assertNotEqual(records, outputs)
+
+    def test_byte_source(self):
+        self.assertEqual(b"", obfuscator.random_bytes(0))
+        self.assertEqual(100, len(obfuscator.random_bytes(100)))
+
+        source1, source2 = obfuscator.seeded_byte_source(42), obfuscator.seeded_byte_source(42)
+        self.assertEqual(source1(50), source2(50))
+
+        _, padded1 = obfuscator.obfuscate(b"test", 1, 4096, byte_source=obfuscator.seeded_byte_source(7))
+        _, padded2 = obfuscator.obfuscate(b"test", 1, 4096, byte_source=obfuscator.seeded_byte_source(7))
+        self.assertEqual(4096, len(padded1))
+        self.assertEqual(padded1, padded2)
+
+        _, padded = obfuscator.obfuscate([1, 2], 1, 10, encoder=2, byte_source=lambda count: b"\x00" * count)
+        self.assertEqual([2, 3] + [0] * 8, padded)
+
+        _, padded = obfuscator.obfuscate(b"ab", 1, 10, encoder=4, byte_source=os.urandom)
+        self.assertEqual(10, len(padded))
+
 
 if __name__ == '__main__':
     unittest.main()
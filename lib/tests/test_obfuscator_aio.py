@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+This is the unit test for obfuscator.aio.
+"""
+import os
+import sys
+import asyncio
+import tempfile
+import unittest
+
+__author__ = "Timothy McFadden"
+__date__ = "10/18/2026"
+__copyright__ = "Timothy McFadden, 2014"
+__license__ = "GPLv2"
+__version__ = "0.01"
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import obfuscator.aio
+import obfuscator.file
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        (fh, self.path) = tempfile.mkstemp()
+        os.close(fh)
+        self.file = obfuscator.aio.AsyncObfuscatedFile(self.path)
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+    def test_small(self):
+        async def run():
+            key = await self.file.write(b"testing", key=9)
+            self.assertEqual(list(b"testing"), await self.file.read(key))
+            self.assertEqual(b"sti", await self.file.read_range(2, 3, key=key))
+            self.assertEqual(7, (await self.file.stat()).length)
+
+        asyncio.run(run())
+        self.assertEqual(list(b"testing"), obfuscator.file.ObfuscatedFile(self.path).read(9))
+
+    def test_large(self):
+        data = bytes(bytearray(range(256))) * 1000
+
+        async def run():
+            await self.file.write(data, encoder=4)
+            self.assertEqual(list(data), await self.file.read())
+            chunks = [chunk async for chunk in self.file.iter_chunks(chunk_size=100000)]
+            self.assertEqual([100000, 100000, 56000], [len(x) for x in chunks])
+            self.assertEqual(data, b"".join(chunks))
+
+            await self.file.write(data, compression="zlib")
+            chunks = [chunk async for chunk in self.file.iter_chunks(chunk_size=100000)]
+            self.assertEqual(data, b"".join(chunks))
+            self.assertTrue(len(chunks) > 1 and max(len(x) for x in chunks) <= 100000)
+
+            async for chunk in self.file.iter_chunks(chunk_size=1000):
+                self.assertEqual(data[:len(chunk)], chunk)
+                break
+
+            await self.file.write_stream([data[:1000], data[1000:]], encoder=1)
+            reads = await asyncio.gather(*[self.file.read_range(x, 100000) for x in range(0, len(data), 100000)])
+            self.assertEqual(data, b"".join(reads))
+
+        asyncio.run(run())
+        self.assertEqual(list(data), obfuscator.file.ObfuscatedFile(self.path).read())
+
+    def test_chunked(self):
+        data = bytes(bytearray(range(256))) * 40
+
+        async def run():
+            key = await self.file.write(data, encoder=5, chunked=1000, checksum=False)
+            self.assertEqual(list(data), await self.file.read(key, workers=2))
+            self.assertEqual(data[1500:2500], await self.file.read_range(1500, 1000, key=key, workers=2))
+
+            await self.file.write_stream([data[:10], data[10:]], chunked=4096)
+            self.assertEqual(list(data), await self.file.read())
+
+        asyncio.run(run())
+        ofile = obfuscator.file.ObfuscatedFile(self.path)
+        self.assertEqual([4096, 4096, 2048], [x.size for x in ofile.chunk_table()])
+        self.assertEqual([], ofile.verify())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+This is the unit test for obfuscator.archive.
+"""
+import os
+import sys
+import random
+import tempfile
+import unittest
+
+__author__ = "Timothy McFadden"
+__date__ = "10/18/2026"
+__copyright__ = "Timothy McFadden, 2014"
+__license__ = "GPLv2"
+__version__ = "0.01"
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from obfuscator.archive import ObfuscatedArchive
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        (fh, self.path) = tempfile.mkstemp()
+        os.close(fh)
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+    def test_write_get(self):
+        # A random XOR key equal to the header mask constant leaves the payload
+        # in the clear, so the keys are made reproducible
+        random.seed(1)
+        archive = ObfuscatedArchive(self.path)
+        self.assertEqual([], archive.names())
+
+        keys = archive.write([("one", b"first"), (u"tw\xf6", b"second" * 100), ("three", b"")], encoder=1)
+        self.assertEqual(["one", u"tw\xf6", "three"], archive.names())
+        self.assertEqual(b"second" * 100, archive.get(u"tw\xf6"))
+
+        archive = ObfuscatedArchive(self.path)
+        self.assertEqual(["one", u"tw\xf6", "three"], archive.names())
+        self.assertEqual(3, len(archive))
+        self.assertIn("one", archive)
+        self.assertEqual(b"first", archive.get("one", key=keys["one"]))
+        self.assertEqual(b"", archive.get("three"))
+        self.assertRaises(KeyError, archive.get, "four")
+
+        with open(self.path, 'rb') as fh:
+            self.assertNotIn(b"first", fh.read())
+
+    def test_add(self):
+        archive = ObfuscatedArchive(self.path)
+        self.assertEqual(7, archive.add("one", b"first", key=7))
+        archive.add("two", b"rot13", encoder=3)
+        self.assertEqual(b"rot13", archive.get("two"))
+        self.assertEqual(b"first", ObfuscatedArchive(self.path).get("one", key=7))
+
+        archive.add("one", b"replaced" * 100, encoder=4, compression="zlib")
+        self.assertEqual(b"replaced" * 100, archive.get("one"))
+        archive.add("one", b"replaced", encoder=4, minimum_length=64)
+        archive = ObfuscatedArchive(self.path)
+        self.assertEqual(["two", "one"], archive.names())
+        self.assertEqual(b"replaced", archive.get("one"))
+        self.assertEqual(b"rot13", archive.get("two"))
+
+    def test_failed_update(self):
+        archive = ObfuscatedArchive(self.path)
+        archive.write({"a": b"alpha", "b": b"beta"})
+        size = os.path.getsize(self.path)
+
+        # The offset encoder can't store 0xFF + key; nothing is written
+        self.assertRaises(ValueError, archive.update, [("c", b"gamma"), ("d", b"\xff" * 10)], encoder=2)
+        self.assertEqual(["a", "b"], archive.names())
+        self.assertEqual(size, os.path.getsize(self.path))
+
+        # A failure while writing truncates the file back
+        def fail(*args):
+            raise IOError("disk full")
+
+        archive._pack_index = fail
+        self.assertRaises(IOError, archive.add, "c", b"gamma")
+        self.assertEqual(size, os.path.getsize(self.path))
+        self.assertNotIn("c", archive)
+
+        archive = ObfuscatedArchive(self.path)
+        self.assertEqual([b"alpha", b"beta"], [archive.get(x) for x in ("a", "b")])
+        archive.add("c", b"gamma")
+        self.assertEqual(b"gamma", ObfuscatedArchive(self.path).get("c"))
+
+    def test_size(self):
+        archive = ObfuscatedArchive(self.path)
+        for index in range(500):
+            archive.add("record %i" % index, b"x" * 40)
+        live = sum(size for (_, size) in archive._index.values())
+        self.assertEqual(live, archive._index_offset)
+        self.assertTrue(os.path.getsize(self.path) < 2 * live)
+
+        # Replaced records are dropped once they outweigh the live ones
+        sizes = []
+        for index in range(600):
+            archive.add("record 0", b"y" * 40)
+            sizes.append(os.path.getsize(self.path))
+        self.assertTrue(max(sizes) < 3 * live)
+        self.assertTrue(min(sizes[400:]) < max(sizes[:400]))
+        self.assertEqual(500, len(ObfuscatedArchive(self.path)))
+        self.assertEqual(b"y" * 40, ObfuscatedArchive(self.path).get("record 0"))
+        self.assertEqual(b"x" * 40, ObfuscatedArchive(self.path).get("record 499"))
+
+        archive.add("record 1", b"z" * 40)
+        archive.compact()
+        self.assertEqual(sum(size for (_, size) in archive._index.values()), archive._index_offset)
+        self.assertEqual(b"z" * 40, ObfuscatedArchive(self.path).get("record 1"))
+
+    def test_not_archive(self):
+        for data in [b"\x00" * 32, b"OBFA", b"\x00" * 20 + b"\x00" * 7 + b"\x04OBFA"]:
+            with open(self.path, 'wb') as fh:
+                fh.write(data)
+            self.assertRaises(ValueError, ObfuscatedArchive, self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+This is the unit test for obfuscator.bench.
+"""
+import os
+import sys
+import json
+import tempfile
+import unittest
+
+__author__ = "Timothy McFadden"
+__date__ = "10/18/2026"
+__copyright__ = "Timothy McFadden, 2014"
+__license__ = "GPLv2"
+__version__ = "0.01"
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import obfuscator.bench
+
+
+class Test(unittest.TestCase):
+    def test_parse_size(self):
+        self.assertEqual(32, obfuscator.bench.parse_size("32"))
+        self.assertEqual(1024, obfuscator.bench.parse_size("1k"))
+        self.assertEqual(16 * 1024 * 1024, obfuscator.bench.parse_size("16MB"))
+        self.assertEqual(1024 ** 3, obfuscator.bench.parse_size("1G"))
+
+    def test_main(self):
+        (fh, path) = tempfile.mkstemp()
+        os.close(fh)
+        try:
+            args = ["--sizes", "32,1K", "--case", "*", "--min-time", "0", "--json", path, "--profile", path + ".prof"]
+            self.assertEqual(0, obfuscator.bench.main(args))
+            with open(path) as fh:
+                report = json.load(fh)
+            self.assertTrue(os.path.getsize(path + ".prof"))
+        finally:
+            os.unlink(path)
+            if os.path.isfile(path + ".prof"):
+                os.unlink(path + ".prof")
+
+        cases = set(x["case"] for x in report["results"])
+        self.assertTrue(set(["encode-0", "decode-4", "padding", "file-read", "file-write"]) <= cases)
+        self.assertEqual(2 * len(cases), len(report["results"]))
+        self.assertTrue(all(x["repeat"] >= 1 and x["peak_bytes"] >= 0 for x in report["results"]))
+
+    def test_list_limit(self):
+        (fh, path) = tempfile.mkstemp()
+        os.close(fh)
+        try:
+            args = ["--sizes", "32,1K", "--case", "*-2", "--min-time", "0", "--json", path, "--list-limit", "512"]
+            self.assertEqual(0, obfuscator.bench.main(args))
+            with open(path) as fh:
+                report = json.load(fh)
+        finally:
+            os.unlink(path)
+
+        skipped = [(x["case"], x["size"]) for x in report["results"] if x.get("skipped")]
+        self.assertEqual([("decode-2", 1024), ("encode-2", 1024)], skipped)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+This is the unit test for obfuscator.cache.
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+__author__ = "Timothy McFadden"
+__date__ = "10/18/2026"
+__copyright__ = "Timothy McFadden, 2014"
+__license__ = "GPLv2"
+__version__ = "0.01"
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from obfuscator.cache import ReadCache
+from obfuscator.file import ObfuscatedFile
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.paths = []
+        for _ in range(3):
+            (fh, path) = tempfile.mkstemp()
+            os.close(fh)
+            self.paths.append(path)
+        ObfuscatedFile.cache = ReadCache(maxsize=2)
+
+    def tearDown(self):
+        ObfuscatedFile.cache = None
+        for path in self.paths:
+            os.unlink(path)
+
+    def test_hit_miss(self):
+        ObfuscatedFile(self.paths[0]).write(b"testing")
+        self.assertEqual(list(b"testing"), ObfuscatedFile(self.paths[0]).read())
+        result = ObfuscatedFile(self.paths[0]).read()
+        self.assertEqual(list(b"testing"), result)
+        result.append(0)  # The cached data must not be changed
+        self.assertEqual(list(b"testing"), ObfuscatedFile(self.paths[0]).read())
+        self.assertEqual((2, 1, 0, 1, 2), tuple(ObfuscatedFile.cache.info())[:5])
+        self.assertEqual(sys.getsizeof(list(b"testing")), ObfuscatedFile.cache.nbytes)
+
+    def test_write_invalidates(self):
+        ofile = ObfuscatedFile(self.paths[0])
+        ofile.write(b"first", key=3)
+        self.assertEqual(list(b"first"), ofile.read(3))
+        ofile.write(b"second", key=3)
+        self.assertEqual(list(b"second"), ofile.read(3))
+        ofile.write_stream([b"third"], key=3)
+        self.assertEqual(list(b"third"), ofile.read(3))
+        self.assertEqual(0, ObfuscatedFile.cache.hits)
+
+    def test_external_change(self):
+        ObfuscatedFile(self.paths[0]).write(b"first")
+        self.assertEqual(list(b"first"), ObfuscatedFile(self.paths[0]).read())
+
+        other = ObfuscatedFile(self.paths[0])
+        other.cache = None  # Written behind the cache's back
+        other.write(b"second, longer")
+        self.assertEqual(list(b"second, longer"), ObfuscatedFile(self.paths[0]).read())
+
+    def test_eviction(self):
+        for (index, path) in enumerate(self.paths):
+            ObfuscatedFile(path).write([index])
+            ObfuscatedFile(path).read()
+
+        self.assertEqual((0, 3, 1, 2, 2), tuple(ObfuscatedFile.cache.info())[:5])
+        ObfuscatedFile(self.paths[0]).read()
+        self.assertEqual(4, ObfuscatedFile.cache.misses)
+        ObfuscatedFile(self.paths[2]).read()
+        self.assertEqual(1, ObfuscatedFile.cache.hits)
+
+        ObfuscatedFile.cache.clear()
+        self.assertEqual(0, len(ObfuscatedFile.cache))
+
+    def test_maxbytes(self):
+        ObfuscatedFile.cache = ReadCache(maxsize=10, maxbytes=3000)
+        for (index, path) in enumerate(self.paths):
+            ObfuscatedFile(path).write(b"x" * 100 * (index + 1))
+            ObfuscatedFile(path).read()
+
+        # The lists take ~800, ~1600 and ~2400 bytes: only the last one fits
+        self.assertEqual([self.paths[2]], [x[0] for x in ObfuscatedFile.cache._entries])
+        self.assertEqual(2, ObfuscatedFile.cache.evictions)
+        self.assertTrue(ObfuscatedFile.cache.nbytes <= 3000)
+
+        ObfuscatedFile(self.paths[0]).write(b"x" * 1000)
+        self.assertEqual(list(b"x" * 1000), ObfuscatedFile(self.paths[0]).read())
+        self.assertEqual([self.paths[2]], [x[0] for x in ObfuscatedFile.cache._entries])
+
+        ObfuscatedFile.cache.invalidate(self.paths[2])
+        self.assertEqual((0, 0), (len(ObfuscatedFile.cache), ObfuscatedFile.cache.nbytes))
+
+    def test_bytearray_key(self):
+        ObfuscatedFile(self.paths[0]).write(b"multi", key=b"xy", encoder=4)
+        self.assertEqual(list(b"multi"), ObfuscatedFile(self.paths[0]).read(key=bytearray(b"xy")))
+        self.assertEqual(list(b"multi"), ObfuscatedFile(self.paths[0]).read(key=b"xy"))
+        self.assertEqual(1, ObfuscatedFile.cache.hits)
+
+
+if __name__ == '__main__':
+    unittest.main()
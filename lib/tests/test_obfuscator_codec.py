@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+This is the unit test for obfuscator.codec.
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+__author__ = "Timothy McFadden"
+__date__ = "10/18/2026"
+__copyright__ = "Timothy McFadden, 2014"
+__license__ = "GPLv2"
+__version__ = "0.01"
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import obfuscator
+import obfuscator.codec
+from obfuscator.file import ObfuscatedFile
+
+
+class NotCodec(obfuscator.Codec):
+    """Invert every bit; used to test custom codecs."""
+    __slots__ = ()
+    id = 200
+    name = "not"
+
+    def encode(self, data, minimum_length=0, byte_source=None):
+        result = bytes(bytearray(x ^ 0xFF for x in bytearray(data)))
+        return result + obfuscator._random_bytes(minimum_length - len(result), byte_source)
+
+    def decode(self, data):
+        return bytes(bytearray(x ^ 0xFF for x in bytearray(data)))
+
+
+class Test(unittest.TestCase):
+    def tearDown(self):
+        for name in (NotCodec.id, NotCodec.name):
+            obfuscator.codec._CODECS.pop(name, None)
+        for func in obfuscator.FUNC_MAP.pop(NotCodec.id, []):
+            obfuscator.FUNC_MAP.pop(func, None)
+
+    def test_builtin(self):
+        data = b"testing" * 10
+        for (encoder, key) in [(0, 0x21), (1, 0x21), (2, 50), ("rot13", None), ("xor_multi", b"abc")]:
+            codec = obfuscator.get_codec(encoder, key)
+            number = obfuscator.codec._CODECS[encoder].id if isinstance(encoder, str) else (encoder or 1)
+            self.assertEqual(obfuscator.obfuscate(data, key, 40, number)[1][:len(data)],
+                             codec.encode(data, 40)[:len(data)])
+            self.assertEqual(list(data), list(codec.decode(codec.encode(list(data)))))
+
+        self.assertRaises(ValueError, obfuscator.get_codec, "unknown")
+        self.assertRaises(AttributeError, setattr, obfuscator.get_codec(1), "other", 1)
+
+    def test_random_key(self):
+        codec = obfuscator.get_codec("xor_multi")
+        self.assertEqual(8, len(codec.key))
+        self.assertTrue(1 <= obfuscator.get_codec(1).key <= 255)
+
+    def test_into(self):
+        data = bytearray(b"testing" * 10000)
+        for encoder in (1, 3, 4):
+            codec = obfuscator.get_codec(encoder, 7)
+            buf = bytearray(data)
+            self.assertEqual(len(data), codec.encode_into(buf, buf))
+            self.assertEqual(codec.encode(bytes(data)), bytes(buf))
+            codec.decode_into(buf, buf)
+            self.assertEqual(data, buf)
+
+        self.assertRaises(ValueError, obfuscator.get_codec(2, 7).encode_into, data, bytearray(len(data)))
+
+    def test_own_schedule(self):
+        codec = obfuscator.get_codec("xor_multi", b"abc")
+        self.assertEqual(b"\x02\x00\x02\x02", codec.encode(b"cbac"))
+        self.assertEqual(6, codec._schedule[0])
+        obfuscator._SCHEDULES.clear()
+        self.assertEqual(b"cbac", codec.decode(b"\x02\x00\x02\x02"))
+        self.assertNotIn(b"abc", obfuscator._SCHEDULES)
+        codec.encode(bytes(100))
+        self.assertEqual(102, codec._schedule[0])
+
+    def test_register(self):
+        obfuscator.register_codec(NotCodec)
+        self.assertRaises(ValueError, obfuscator.register_codec, NotCodec)
+        self.assertIsInstance(obfuscator.get_codec("not"), NotCodec)
+
+        key, encoded = obfuscator.obfuscate(b"testing", encoder=200, minimum_length=0)
+        self.assertEqual(b"\x8b\x9a\x8c\x8b\x96\x91\x98", encoded)
+        self.assertEqual(b"testing", obfuscator.deobfuscate(key, encoded, encoder=200))
+
+        (fh, path) = tempfile.mkstemp()
+        os.close(fh)
+        try:
+            ofile = ObfuscatedFile(path)
+            ofile.write(b"testing", encoder=200)
+            self.assertEqual(list(b"testing"), ofile.read())
+            self.assertEqual(200, ofile.stat().encoder)
+        finally:
+            os.unlink(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,6 @@
 """
 This is the unit test for obfuscator.file.
 """
-from __future__ import print_function
 import os
 import sys
 import tempfile
@@ -15,17 +14,10 @@ __license__ = "GPLv2"
 __version__ = "0.01"
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import obfuscator
 import obfuscator.file
 
 
-if sys.version_info.major > 2:
-    import builtins
-    xrange = range
-
-    def map(*args):
-        return list(builtins.map(*args))
-
-
 class Test(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -41,7 +33,7 @@ class Test(unittest.TestCase):
             print("WARNING: couldn't delete [%s]" % Test.testfile_path)
 
     def test_01_write_string(self):
-        data = map(ord, "testing")
+        data = list(map(ord, "testing"))
         key = Test.file.write(data, key=123, minimum_length=32)
         self.assertEqual(32, os.path.getsize(Test.testfile_path))
         self.assertGreater(key, 0)
@@ -71,7 +63,7 @@ class Test(unittest.TestCase):
         self.assertEqual([1, 2, 3, 4], data)
 
     def test_06_write_rot13_string(self):
-        data = map(ord, "testing")
+        data = list(map(ord, "testing"))
         Test.file.write(data, minimum_length=0)
         self.assertEqual(len(data) + Test.file.size, os.path.getsize(Test.testfile_path))
 
@@ -82,9 +74,278 @@ class Test(unittest.TestCase):
 
     def test_08_write_long(self):
         data = [23] * 270
-        self.assertRaises(ValueError, Test.file.write, data, 0)
-        # Test.file.write(data, minimum_length=0)
-        # self.assertEqual(len(data) + Test.file.size, os.path.getsize(Test.testfile_path))
+        Test.file.write(data, minimum_length=0)
+        self.assertEqual(len(data) + Test.file.size_v2, os.path.getsize(Test.testfile_path))
+
+    def test_09_read_long(self):
+        self.assertEqual([23] * 270, Test.file.read())
+
+    def test_10_write_long_key(self):
+        data = list(range(256)) * 300
+        Test.file.write(data, key=0x42, minimum_length=100000)
+        self.assertEqual(100000, os.path.getsize(Test.testfile_path))
+        self.assertEqual(data, Test.file.read(key=0x42))
+
+    def test_11_read_legacy_header(self):
+        # Legacy headers never have the version bit set, whatever the random bits
+        for _ in range(50):
+            Test.file.write([1, 2, 3], minimum_length=0)
+            self.assertEqual([1, 2, 3], Test.file.read())
+
+    def test_12_read_range(self):
+        data = list(range(256)) * 4
+        Test.file.write(data, minimum_length=2000)
+        self.assertEqual(bytes(bytearray(range(10, 20))), Test.file.read_range(10, 10))
+        self.assertEqual(bytes(bytearray(range(250, 256))), Test.file.read_range(1018))
+        self.assertEqual(bytes(bytearray(range(250, 256))), Test.file.read_range(1018, 100))
+        self.assertEqual(b"", Test.file.read_range(5000, 10))
+        self.assertRaises(ValueError, Test.file.read_range, -1)
+
+    def test_13_read_range_key(self):
+        Test.file.write(list(map(ord, "testing")), key=123, minimum_length=32)
+        self.assertEqual(b"sti", Test.file.read_range(2, 3, key=123))
+
+    def test_14_write_stream(self):
+        import io
+        data = bytes(bytearray(range(256))) * 1000
+        key = Test.file.write_stream(io.BytesIO(data), chunk_size=1000)
+        self.assertGreater(key, 0)
+        self.assertEqual(len(data) + Test.file.size_v2, os.path.getsize(Test.testfile_path))
+        self.assertEqual(data, Test.file.read_range(0))
+
+    def test_15_write_stream_chunks(self):
+        key = Test.file.write_stream([b"test", bytearray(b"ing"), [33]], key=123, minimum_length=64)
+        self.assertEqual(123, key)
+        self.assertEqual(64, os.path.getsize(Test.testfile_path))
+        self.assertEqual(list(map(ord, "testing!")), Test.file.read(key=123))
+
+    def test_16_write_xor_multi(self):
+        data = list(map(ord, "testing multi-byte keys"))
+        key = Test.file.write(data, encoder=4, minimum_length=64)
+        self.assertEqual(8, len(key))
+        self.assertEqual(64, os.path.getsize(Test.testfile_path))
+        self.assertEqual(data, Test.file.read())
+        self.assertEqual(b"multi", Test.file.read_range(8, 5))
+
+    def test_17_write_xor_multi_key(self):
+        data = list(map(ord, "testing"))
+        Test.file.write(data, key=b"secret", encoder=4, minimum_length=0)
+        self.assertEqual(len(data) + Test.file.size, os.path.getsize(Test.testfile_path))
+        self.assertEqual(data, Test.file.read(key=b"secret"))
+        self.assertNotEqual(data, Test.file.read())
+
+    def test_18_write_stream_xor_multi(self):
+        data = b"0123456789" * 1000
+        Test.file.write_stream([data[:333], data[333:]], encoder=4)
+        self.assertEqual(data, Test.file.read_range(0))
+        self.assertEqual(data[5001:5011], Test.file.read_range(5001, 10))
+
+    def test_19_byte_source(self):
+        def write():
+            ofile = obfuscator.file.ObfuscatedFile(Test.testfile_path, obfuscator.seeded_byte_source(3))
+            ofile.write(list(map(ord, "testing")), key=123, minimum_length=4096)
+            with open(Test.testfile_path, 'rb') as fh:
+                return fh.read()
+
+        self.assertEqual(4096, len(write()))
+        self.assertEqual(write(), write())
+        self.assertEqual(list(map(ord, "testing")), Test.file.read(key=123))
+
+    def test_20_stat(self):
+        Test.file.write(list(map(ord, "testing")), minimum_length=32)
+        self.assertEqual((7, 0, None, 1, 20, None, 0), tuple(Test.file.stat()))
+
+        Test.file.write([1] * 300, key=5, minimum_length=400, encoder=2)
+        self.assertEqual(obfuscator.file.FileStat(300, 2, False, 2, 87, None, 0), obfuscator.file.probe(Test.testfile_path))
+
+        Test.file.write(b"testing", encoder=4, minimum_length=0)
+        stat = Test.file.stat()
+        self.assertEqual((7, 4, True, 3, 0, None, 0), tuple(stat))
+        self.assertEqual(7, stat.length)
+
+        Test.file.write_stream([b"testing"], minimum_length=0)
+        self.assertEqual((7, 0, True, 2, 0, None, 0), tuple(Test.file.stat()))
+
+    def test_21_offset_mod(self):
+        data = bytes(bytearray(range(256)))
+        key = Test.file.write(data, encoder=5)
+        self.assertEqual(list(data), Test.file.read())
+        self.assertEqual(data[250:], Test.file.read_range(250))
+        self.assertEqual(5, Test.file.stat().encoder)
+        self.assertEqual(list(data), Test.file.read(key))
+
+    def test_22_compression(self):
+        data = b'{"name": "value", "list": [1, 2, 3]}' * 200
+        for compression in sorted(obfuscator.file.COMPRESSION):
+            if compression == "lzma" and obfuscator.file.lzma is None:
+                continue
+
+            key = Test.file.write(data, encoder=4, compression=compression)
+            stat = Test.file.stat()
+            self.assertEqual(compression, stat.compression)
+            self.assertTrue(stat.length < len(data) // 5)
+            self.assertEqual(list(data), Test.file.read())
+            self.assertEqual(data[100:150], Test.file.read_range(100, 50, key=key))
+
+            Test.file.write_stream(
+                [data[x:x + 1000] for x in range(0, len(data), 1000)], key=9, encoder=1, compression=compression)
+            self.assertEqual(compression, Test.file.stat().compression)
+            self.assertEqual(list(data), Test.file.read(9))
+
+        self.assertRaises(ValueError, Test.file.write, data, compression="zip")
+
+    def test_23_chunked(self):
+        data = bytes(bytearray(range(256))) * 40
+        for (encoder, compression) in [(1, None), (4, None), (5, "zlib")]:
+            key = Test.file.write(data, 77, minimum_length=0, encoder=encoder, compression=compression, chunked=1000)
+            table = Test.file.chunk_table()
+            self.assertEqual(11, len(table))
+            self.assertEqual([1000] * 10 + [240], [x.size for x in table])
+            self.assertEqual(1000, Test.file.stat().chunk_size)
+
+            self.assertEqual(list(data), Test.file.read(key))
+            self.assertEqual(list(data), Test.file.read(key, workers=4))
+            self.assertEqual(data[1500:4321], Test.file.read_range(1500, 2821, key=key, workers=2))
+            self.assertEqual(data[9990:], Test.file.read_range(9990, key=key))
+            self.assertEqual(b"", Test.file.read_range(20000, key=key))
+            self.assertEqual(data[3000:4000], Test.file.read_chunk(3, key=key))
+            self.assertEqual([], Test.file.verify())
+
+        Test.file.write_stream([data[:10], data[10:5000], data[5000:]], chunked=4096, minimum_length=20000)
+        self.assertEqual(list(data), Test.file.read())
+        stat = Test.file.stat()
+        self.assertEqual(20000 - 13 - 2 - 7 - 4 - 3 * 20 - len(data), stat.padding)
+
+        # Corrupt the last chunk
+        with open(Test.testfile_path, 'r+b') as fh:
+            fh.seek(stat.length - 10)
+            fh.write(b"\x00\xFF")
+        self.assertEqual([2], Test.file.verify())
+        self.assertRaises(ValueError, Test.file.read_chunk, 2)
+        self.assertEqual(data[:4096], Test.file.read_chunk(0))
+
+        Test.file.write(data)
+        self.assertRaises(ValueError, Test.file.chunk_table)
+        self.assertRaises(ValueError, Test.file.verify)
+
+    def test_24_text(self):
+        text = u"testing \u00e9\u4e2d"
+        key = Test.file.write_text(text, encoder=4)
+        self.assertEqual(text, Test.file.read_text())
+        self.assertEqual(list(bytearray(text.encode("utf-8"))), Test.file.read(key))
+
+        Test.file.write_text(text, key=12, encoding="utf-16", compression="zlib")
+        self.assertEqual(text, Test.file.read_text(12, encoding="utf-16"))
+
+    def test_25_read_stream(self):
+        data = bytes(bytearray(range(256))) * 300
+        for kwargs in [{}, {"encoder": 4}, {"compression": "zlib"}, {"chunked": 10000}]:
+            Test.file.write(data, minimum_length=100000, **kwargs)
+            pieces = list(Test.file.read_stream(chunk_size=7000))
+            self.assertEqual(data, b"".join(pieces))
+            self.assertTrue(max(len(x) for x in pieces) <= 10000)
+
+    def test_26_stream_pipe(self):
+        import io
+        import subprocess
+        data = bytes(bytearray(range(256))) * 300
+
+        # A non-seekable output leaves the length unknown
+        output = io.BytesIO()
+        output.seekable = lambda: False
+        key = Test.file.write_stream([data], encoder=5, minimum_length=100000, output=output)
+        self.assertEqual(len(data) + 13, len(output.getvalue()))
+        self.assertEqual(data, b"".join(Test.file.read_stream(source=io.BytesIO(output.getvalue()))))
+        with open(Test.testfile_path, 'wb') as fh:
+            fh.write(output.getvalue())
+        self.assertEqual(data[-10:], Test.file.read_range(len(data) - 10, key=key))
+        self.assertEqual(len(data), Test.file.stat().length)
+
+        environment = dict(os.environ, PYTHONPATH=os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+        command = [sys.executable, "-m", "obfuscator.file"]
+        encoded = subprocess.check_output(command + ["encode", "-e", "4", "-c", "bz2"], input=data, env=environment)
+        self.assertNotIn(data[:100], encoded)
+        self.assertEqual(data, subprocess.check_output(command + ["decode"], input=encoded, env=environment))
+
+    def test_27_stream_main(self):
+        data = b"testing" * 10000
+        (fh, source) = tempfile.mkstemp()
+        os.write(fh, data)
+        os.close(fh)
+        try:
+            self.assertEqual(0, obfuscator.file.main(
+                ["", "encode", source, "-o", Test.testfile_path, "-k", "0x5A", "-p", "100000"]))
+            self.assertEqual(100000, os.path.getsize(Test.testfile_path))
+            self.assertEqual(list(data), Test.file.read(0x5A))
+            self.assertEqual(0, obfuscator.file.main(["", "decode", Test.testfile_path, "-o", source, "-k", "90"]))
+            with open(source, 'rb') as fh:
+                self.assertEqual(data, fh.read())
+
+            obfuscator.file.main(["", "encode", source, "-o", Test.testfile_path, "-k", "0102", "-e", "4",
+                                  "--chunked", "4096"])
+            self.assertEqual(4096, Test.file.stat().chunk_size)
+            self.assertEqual(list(data), Test.file.read(b"\x01\x02"))
+
+            # A chunked file is decoded from the handle opened by main()
+            self.assertEqual(0, obfuscator.file.main(["", "decode", Test.testfile_path, "-o", source, "-k", "0102"]))
+            with open(source, 'rb') as fh:
+                self.assertEqual(data, fh.read())
+        finally:
+            os.unlink(source)
+
+    def test_28_stream_main_errors(self):
+        import io
+        import contextlib
+        errors = [
+            (["encode", "--chunked", "4096"], "requires an output path"),
+            (["encode", "-e", "9", "-o", Test.testfile_path], "unknown encoder 9"),
+            (["decode", Test.testfile_path + ".missing"], "cannot open"),
+            (["decode", Test.testfile_path, "-k", "xyz"], "invalid key"),
+        ]
+        for (args, message) in errors:
+            stderr = io.StringIO()
+            with contextlib.redirect_stderr(stderr):
+                with self.assertRaises(SystemExit) as context:
+                    obfuscator.file.main([""] + args)
+            self.assertEqual(2, context.exception.code)
+            self.assertIn(message, stderr.getvalue())
+
+        # Not an obfuscated file
+        with open(Test.testfile_path, 'wb') as fh:
+            fh.write(b"plain text")
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            with self.assertRaises(SystemExit) as context:
+                obfuscator.file.main(["", "decode", Test.testfile_path, "-o", os.devnull])
+        self.assertEqual(1, context.exception.code)
+        self.assertIn("error:", stderr.getvalue())
+
+    def test_29_stream_main_garbage(self):
+        import io
+        import random
+        import contextlib
+        import subprocess
+        environment = dict(os.environ, PYTHONPATH=os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+        command = [sys.executable, "-m", "obfuscator.file", "decode"]
+        for data in (b"", b"abc"):
+            process = subprocess.run(command, input=data, env=environment, capture_output=True)
+            self.assertEqual(1, process.returncode)
+            self.assertNotIn(b"Traceback", process.stderr)
+            self.assertIn(b"Not an obfuscated file", process.stderr)
+
+        with open(Test.testfile_path, 'wb') as fh:
+            pass
+        self.assertRaises(ValueError, Test.file.stat)
+
+        rand = random.Random(0)
+        for _ in range(40):
+            with open(Test.testfile_path, 'wb') as fh:
+                fh.write(bytes(bytearray(rand.getrandbits(8) for _ in range(200))))
+            with contextlib.redirect_stderr(io.StringIO()):
+                try:
+                    obfuscator.file.main(["", "decode", Test.testfile_path, "-o", os.devnull])
+                except SystemExit as error:  # Anything else is a traceback
+                    self.assertEqual(1, error.code)
 
     def test_main(self):
         obfuscator.file.main(["", "encode-str", "temp.bin", "13", "testing"])
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+This is the unit test for obfuscator.instrument.
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+__author__ = "Timothy McFadden"
+__date__ = "10/18/2026"
+__copyright__ = "Timothy McFadden, 2014"
+__license__ = "GPLv2"
+__version__ = "0.01"
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import obfuscator
+from obfuscator import instrument
+from obfuscator.file import ObfuscatedFile
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.events = []
+        instrument.reset()
+        instrument.enable()
+        instrument.add_hook(self.events.append)
+
+    def tearDown(self):
+        instrument.disable()
+        instrument.remove_hook(self.events.append)
+        instrument.reset()
+
+    def test_disabled(self):
+        instrument.disable()
+        obfuscator.obfuscate(b"testing")
+        self.assertEqual({}, obfuscator.stats())
+        self.assertEqual([], self.events)
+
+    def test_obfuscate(self):
+        key, data = obfuscator.obfuscate(b"testing", encoder=3)
+        obfuscator.obfuscate(b"testing", encoder=3, minimum_length=0)
+        obfuscator.deobfuscate(key, data, encoder=3)
+
+        stats = obfuscator.stats()
+        self.assertEqual((2, 14, 39, 25), stats[(3, "encode")][:4])
+        self.assertEqual((1, 32, 32, 0), stats[(3, "decode")][:4])
+        self.assertTrue(stats[(3, "encode")].seconds > 0)
+        self.assertEqual(["obfuscate", "obfuscate", "deobfuscate"], [x.operation for x in self.events])
+
+    def test_file(self):
+        (fh, path) = tempfile.mkstemp()
+        os.close(fh)
+        try:
+            ofile = ObfuscatedFile(path)
+            ofile.write(b"testing", encoder=4, minimum_length=64)
+            self.assertEqual(list(b"testing"), ofile.read())
+        finally:
+            os.unlink(path)
+
+        (write, read) = [x for x in self.events if x.operation in ("write", "read")]
+        self.assertEqual(["header", "encode", "write"], list(write.stages))
+        self.assertEqual((4, 7, 64), (write.encoder, write.bytes_in, write.bytes_out))
+        self.assertEqual(["open", "header", "decode"], list(read.stages))
+        self.assertEqual((4, 7, 7), (read.encoder, read.bytes_in, read.bytes_out))
+        self.assertEqual(1, obfuscator.stats()[(4, "decode")].calls)
+
+    def test_counted_once(self):
+        (fh, path) = tempfile.mkstemp()
+        os.close(fh)
+        try:
+            ofile = ObfuscatedFile(path)
+            ofile.write(b"hello world")
+            self.assertEqual(list(b"hello world"), ofile.read())
+        finally:
+            os.unlink(path)
+
+        self.assertEqual(["read", "write"], sorted(x.operation for x in self.events))
+        self.assertEqual([(1, "decode"), (1, "encode")], sorted(obfuscator.stats()))
+        self.assertEqual((1, 11), obfuscator.stats()[(1, "encode")][:2])
+
+        instrument.reset()
+        key, data = obfuscator.obfuscate(b"hello world", encoder=0)
+        obfuscator.deobfuscate(key, data, encoder=0)
+        self.assertEqual([(1, "decode"), (1, "encode")], sorted(obfuscator.stats()))
+        self.assertEqual((1, 11), obfuscator.stats()[(1, "encode")][:2])
+
+    def test_encoder_totals(self):
+        # The file and top-level paths add up to the same per-encoder totals
+        (fh, path) = tempfile.mkstemp()
+        os.close(fh)
+        try:
+            ofile = ObfuscatedFile(path)
+            key = ofile.write(b"x" * 50, encoder=5, minimum_length=0)
+            ofile.read(key)
+            obfuscator.obfuscate(b"y" * 100, key, 0, encoder=5)
+            obfuscator.deobfuscate(key, b"y" * 30, encoder=5)
+            ofile.write(b"z" * 10, encoder=1, minimum_length=0)
+        finally:
+            os.unlink(path)
+
+        stats = obfuscator.stats()
+        self.assertEqual([(1, "encode"), (5, "decode"), (5, "encode")], sorted(stats))
+        self.assertEqual((2, 150), stats[(5, "encode")][:2])
+        self.assertEqual((2, 80, 80), stats[(5, "decode")][:3])
+        totals = {}
+        for ((encoder, _), counters) in stats.items():
+            totals[encoder] = totals.get(encoder, 0) + counters.bytes_in
+        self.assertEqual({1: 10, 5: 230}, totals)
+        self.assertEqual(["write", "read", "obfuscate", "deobfuscate", "write"], [x.operation for x in self.events])
+
+    def test_excluded(self):
+        key, chunks = obfuscator.obfuscate_stream([b"hello", b"world"], encoder=0)
+        list(chunks)
+        obfuscator.obfuscate_many([b"hello", b"world"], encoder=0)
+        obfuscator.obfuscate_many([b"hello", b"world"], encoder=4)
+        obfuscator.obfuscate_into(bytearray(b"hello"), encoder=0)
+        self.assertEqual({}, obfuscator.stats())
+
+
+if __name__ == '__main__':
+    unittest.main()
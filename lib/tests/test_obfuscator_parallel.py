@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""
+This is the unit test for obfuscator.parallel.
+"""
+import os
+import sys
+import time
+import tempfile
+import unittest
+
+__author__ = "Timothy McFadden"
+__date__ = "10/18/2026"
+__copyright__ = "Timothy McFadden, 2014"
+__license__ = "GPLv2"
+__version__ = "0.01"
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import obfuscator
+import obfuscator.parallel
+from obfuscator.file import ObfuscatedFile
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        self.thresholds = (obfuscator.parallel.THRESHOLD, obfuscator.parallel.TABLE_THRESHOLD)
+        obfuscator.parallel.THRESHOLD = obfuscator.parallel.TABLE_THRESHOLD = 1024
+        self.data = bytes(bytearray(range(256))) * 100
+
+    def tearDown(self):
+        (obfuscator.parallel.THRESHOLD, obfuscator.parallel.TABLE_THRESHOLD) = self.thresholds
+
+    def test_transform(self):
+        for encoder, key in [(1, 0x5A), (3, None), (4, b"abcdefg")]:
+            expected = obfuscator.obfuscate(self.data, key, 0, encoder)[1]
+            self.assertEqual(expected, obfuscator.parallel.transform(self.data, key, encoder, 3))
+            self.assertEqual(self.data, obfuscator.parallel.transform(expected, key, encoder, 3, decode=True))
+
+    def test_obfuscate_workers(self):
+        key, encoded = obfuscator.obfuscate(bytearray(self.data), minimum_length=0, encoder=4, workers=2)
+        self.assertIsInstance(encoded, bytearray)
+        self.assertEqual(obfuscator.obfuscate_xor_multi(self.data, key, 0)[1], encoded)
+        self.assertEqual(self.data, obfuscator.deobfuscate(key, bytes(encoded), encoder=4, workers=2))
+
+        key, encoded = obfuscator.obfuscate(self.data, minimum_length=len(self.data) + 10, workers=2)
+        self.assertEqual(len(self.data) + 10, len(encoded))
+
+        out = bytearray(len(self.data))
+        obfuscator.deobfuscate(key, encoded[:len(self.data)], out=out, workers=2)
+        self.assertEqual(self.data, out)
+
+    def test_reuse(self):
+        encoded = obfuscator.parallel.transform(self.data, 0x5A, 1, 2)
+        (pool, block) = (obfuscator.parallel._pool, obfuscator.parallel._block)
+        self.assertEqual(self.data[:10], obfuscator.parallel.transform(encoded[:10], 0x5A, 1, 2, decode=True))
+        self.assertIs(pool, obfuscator.parallel._pool)
+        self.assertIs(block, obfuscator.parallel._block)
+
+        obfuscator.parallel.shutdown()
+        self.assertEqual((None, None), (obfuscator.parallel._pool, obfuscator.parallel._block))
+
+    def test_release(self):
+        (keep_size, idle_timeout) = (obfuscator.parallel.KEEP_SIZE, obfuscator.parallel.IDLE_TIMEOUT)
+        try:
+            # A block larger than KEEP_SIZE is freed as soon as the call returns
+            obfuscator.parallel.KEEP_SIZE = 1024
+            encoded = obfuscator.parallel.transform(self.data, 0x5A, 1, 2)
+            self.assertIsNone(obfuscator.parallel._block)
+            self.assertEqual(self.data, obfuscator.parallel.transform(encoded, 0x5A, 1, 2, decode=True))
+
+            # The pool is stopped once it's idle
+            obfuscator.parallel.IDLE_TIMEOUT = 0.05
+            obfuscator.parallel.transform(self.data[:100], 0x5A, 1, 2)
+            self.assertIsNotNone(obfuscator.parallel._pool)
+            time.sleep(0.5)
+            self.assertEqual((None, None), (obfuscator.parallel._pool, obfuscator.parallel._block))
+        finally:
+            (obfuscator.parallel.KEEP_SIZE, obfuscator.parallel.IDLE_TIMEOUT) = (keep_size, idle_timeout)
+            obfuscator.parallel.shutdown()
+
+    def test_translate(self):
+        table = bytes(bytearray(range(255, -1, -1)))
+        self.assertEqual(self.data.translate(table), obfuscator.parallel.translate(self.data, table, 3))
+        self.assertEqual(b"", obfuscator.parallel.translate(b"", table, 3))
+
+    def test_read_workers(self):
+        (fh, path) = tempfile.mkstemp()
+        os.close(fh)
+        try:
+            ofile = ObfuscatedFile(path)
+            for encoder in (1, 3, 5):
+                key = ofile.write(self.data, encoder=encoder, chunked=5000)
+                self.assertEqual(list(self.data), ofile.read(key, workers=2))
+                self.assertEqual(self.data[4000:12345], ofile.read_range(4000, 8345, key=key, workers=2))
+
+            # Corrupt the second chunk
+            header_size = os.path.getsize(path) - ofile.stat().length - 4 - 20 * len(ofile.chunk_table())
+            with open(path, 'r+b') as fh:
+                fh.seek(header_size + 6000)
+                fh.write(b"\x00\xFF")
+            self.assertRaises(ValueError, ofile.read, key, 2)
+            self.assertEqual(self.data[:4000], ofile.read_range(0, 4000, key=key, workers=2))
+        finally:
+            os.unlink(path)
+
+    def test_use_workers(self):
+        self.assertTrue(obfuscator._use_workers(self.data, 1, 2))
+        self.assertFalse(obfuscator._use_workers(self.data, 1, 1))
+        self.assertFalse(obfuscator._use_workers(self.data, 2, 2))
+        self.assertFalse(obfuscator._use_workers(self.data[:100], 1, 2))
+        self.assertFalse(obfuscator._use_workers(list(self.data), 1, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+This is the unit test for obfuscator.recover.
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+__author__ = "Timothy McFadden"
+__date__ = "10/18/2026"
+__copyright__ = "Timothy McFadden, 2014"
+__license__ = "GPLv2"
+__version__ = "0.01"
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import obfuscator
+from obfuscator.file import ObfuscatedFile
+from obfuscator.recover import recover_key, main
+
+TEXT = b"The quick brown fox jumps over the lazy dog.\n" * 2000
+
+
+class Test(unittest.TestCase):
+    def setUp(self):
+        (fh, self.path) = tempfile.mkstemp()
+        os.close(fh)
+        self.file = ObfuscatedFile(self.path)
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+    def test_charset(self):
+        for encoder in (1, 5):
+            self.file.write(TEXT, key=77, encoder=encoder)
+            best = recover_key(self.path)[0]
+            self.assertEqual((encoder, 77, 1.0), best[:3])
+            self.assertEqual(TEXT[:32], best.preview)
+
+        self.file.write(TEXT, key=77, encoder=3)
+        self.assertEqual([(3, None)], [x[:2] for x in recover_key(self.path)])
+
+        self.file.write(b"0123456789" * 100, key=200)
+        self.assertEqual(200, recover_key(self.path, charset="0123456789")[0].key)
+
+    def test_known_plaintext(self):
+        self.file.write(TEXT, key=0x5A, compression="zlib")
+        count = float(TEXT[:65536].count(b"lazy dog"))  # The decompressed sample is 64K
+        self.assertEqual([(1, 0x5A, count)], [x[:3] for x in recover_key(self.path, known_plaintext="lazy dog")])
+
+        self.file.write(TEXT, key=3, encoder=5, compression="bz2", chunked=10000)
+        self.assertEqual(3, recover_key(self.path, known_plaintext=b"fox", sample_size=1000)[0].key)
+
+        self.assertEqual([], recover_key(self.path, known_plaintext=b"cat"))
+
+    def test_predicate(self):
+        self.file.write(TEXT, key=123)
+        calls = []
+
+        def predicate(data):
+            calls.append(len(data))
+            return data.startswith(b"The ")
+
+        self.assertEqual([(1, 123)], [x[:2] for x in recover_key(self.path, predicate=predicate)])
+        self.assertEqual(256, len(calls))  # 255 prefixes, and one full sample
+
+    def test_raw(self):
+        key, data = obfuscator.obfuscate(TEXT[:100], key=9, minimum_length=0, encoder=2)
+        self.assertEqual((2, 9), recover_key(data, encoders=[2])[0][:2])
+        self.assertEqual((5, 9), recover_key(bytes(bytearray(x & 0xFF for x in data)))[0][:2])
+
+    def test_errors(self):
+        self.file.write(TEXT, key=b"abc", encoder=4)
+        self.assertRaises(ValueError, recover_key, self.path)
+        self.assertRaises(ValueError, recover_key, self.path, known_plaintext=b"x", charset=b"x")
+        self.assertRaises(ValueError, recover_key, self.path, known_plaintext=b"")
+
+    def test_main(self):
+        self.file.write(TEXT, key=77)
+        self.assertEqual(0, main([self.path, "--known", "fox", "--limit", "1"]))
+        self.assertEqual(1, main([self.path, "--known-hex", "00ff00"]))
+        self.assertEqual(0, main([self.path, "--raw", "--encoder", "1", "--threshold", "0.5"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
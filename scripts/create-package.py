@@ -3,7 +3,6 @@
 This script is used to create the release package.
 """
 # Imports ######################################################################
-from __future__ import print_function
 import os
 import sys
 import shutil
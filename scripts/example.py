@@ -3,7 +3,6 @@
 This script is used to demonstrate usage of the obfuscator library.
 """
 # Imports ######################################################################
-from __future__ import print_function
 import os
 import sys
 import random
@@ -22,17 +21,17 @@ def clear():
 
 
 def rtn_cont():
-    raw_input("\nPress return to continue ")
+    input("\nPress return to continue ")
 
 
 def encode_string():
     while True:
-        text = raw_input("Enter some text to encode: ")
+        text = input("Enter some text to encode: ")
 
         if not text:
             return True
 
-        minimum = raw_input("Select the minimum number of characters: ")
+        minimum = input("Select the minimum number of characters: ")
 
         if minimum.isdigit():
             minimum = int(minimum)
@@ -43,9 +42,9 @@ def encode_string():
 
         for encoder in [1, 2, 3]:
             print("function:", obfuscator.FUNC_MAP[encoder][0].__name__)
-            key, data = obfuscator.obfuscate(map(ord, text), key=key, encoder=encoder, minimum_length=minimum)
+            key, data = obfuscator.obfuscate_text(text, key=key, encoder=encoder, minimum_length=minimum)
             print("    key:", key)
-            print("    data:", data)
+            print("    data:", list(data))  # In the form "Decode data" expects
             print("    data as string:", ''.join(map(chr, data)))
 
         rtn_cont()
@@ -55,8 +54,8 @@ def decode_data():
     # [122, 108, 45, 103, 114, 107, 103]
     while True:
         print("Enter the byte array to decode, in the form of: [102, 98, 122, 114]")
-        text = raw_input("bytes: ")
-        key = raw_input("Enter the key used to encode the data: ")
+        text = input("bytes: ")
+        key = input("Enter the key used to encode the data: ")
 
         if not text:
             return True
@@ -66,14 +65,15 @@ def decode_data():
         else:
             key = 0
 
-        bytes = map(int, text.strip("[]").replace(" ", "").split(","))
+        encoded = [int(x) for x in text.strip("[]").replace(" ", "").split(",")]
 
         for encoder in [1, 2, 3]:
             print("function:", obfuscator.FUNC_MAP[encoder][1].__name__)
-            data = obfuscator.deobfuscate(key, bytes, encoder=encoder)
+            data = obfuscator.deobfuscate(key, encoded, encoder=encoder)
             print("    key:", key)
             print("    data:", data)
-            print("    data as string:", ''.join(map(chr, data)))
+            # The wrong decoder can produce values outside of a byte
+            print("    data as string:", ''.join(chr(x & 0xFF) for x in data))
 
         rtn_cont()
 
@@ -85,13 +85,11 @@ def menu():
     print("Obfuscator CLI (" + obfuscator.__version__ + ")")
     print("=" * 25)
 
-    keylist = function_dict.keys()
-    keylist.sort()
-    for key in keylist:
+    for key in sorted(function_dict):
         print("%2s: %s" % (key, function_dict[key]['text']))
 
     print("")
-    selection = raw_input("Please select a menu item, or 0 to exit: ")
+    selection = input("Please select a menu item, or 0 to exit: ")
 
     if len(selection) == 0:
         return True